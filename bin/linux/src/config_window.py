@@ -1,10 +1,14 @@
-import flet as ft
 import os
 import sys
 import json
 import asyncio
+import threading
 import subprocess
 import logging
+from watchdog.observers import Observer
+from watchdog.events import FileSystemEventHandler
+
+from instance_lock import InstanceLock
 
 EXE_DIR = os.path.dirname(
     os.path.abspath(sys.executable if getattr(sys, "frozen", False) else __file__)
@@ -23,6 +27,14 @@ APPLICATIONS_DIR = os.path.expanduser("~/.local/share/applications")
 APP_MENU_FILE = os.path.join(APPLICATIONS_DIR, "snipping-lens.desktop")
 ICON_PATH = os.path.abspath(os.path.join(EXE_DIR, "..", "assets", "sniplens.png"))
 
+# Captured key names treated as modifiers in the hotkey display.
+DISPLAY_MODIFIERS = frozenset(
+    {
+        "lctrl", "rctrl", "lalt", "ralt", "lshift", "rshift",
+        "lwin", "rwin", "ctrl", "alt", "shift", "win",
+    }
+)
+
 logging.basicConfig(
     filename=LOG_FILE,
     level=logging.INFO,
@@ -45,26 +57,48 @@ MODIFIER_KEYS = {
 GENERIC_MODIFIER_NAMES = {"control", "alt", "shift", "meta", "cmd"}
 
 
+instance_lock = InstanceLock(LOCKFILE)
+
+
 def write_pid_lock():
-    try:
-        with open(LOCKFILE, "w") as f:
-            f.write(str(os.getpid()))
-    except Exception:
-        pass
+    if not instance_lock.acquire():
+        logging.info("Config window already running. Exiting.")
+        sys.exit(0)
 
 
-def remove_lock():
-    try:
-        if os.path.exists(LOCKFILE):
-            os.remove(LOCKFILE)
-    except Exception:
-        pass
+write_pid_lock()
+
+# Flet is imported only once the lock is held, so a duplicate launch exits
+# before loading it.
+import flet as ft
+
+
+# Raw settings as this window last read or wrote them, keyed by the file's
+# (mtime, size) at that moment. The watchdog and tray also write the file,
+# so it is re-read only once that key changes.
+settings_cache = {"key": None, "raw": None}
+# Flet runs sync handlers on a thread pool and async ones on its loop, so
+# saves can come from both; only one may write settings.json at a time.
+settings_lock = threading.RLock()
+
+
+def settings_file_key():
+    st = os.stat(SETTINGS_PATH)
+    return (st.st_mtime_ns, st.st_size)
+
+
+def read_raw_settings():
+    key = settings_file_key()
+    if key != settings_cache["key"]:
+        with open(SETTINGS_PATH, "r") as f:
+            settings_cache["raw"] = json.load(f)
+        settings_cache["key"] = key
+    return settings_cache["raw"]
 
 
 def load_settings():
     try:
-        with open(SETTINGS_PATH, "r") as f:
-            raw = json.load(f)
+        raw = read_raw_settings()
 
         def val(key, default):
             v = raw.get(key, default)
@@ -86,32 +120,56 @@ def load_settings():
 
 
 def save_settings(settings):
-    try:
+    with settings_lock:
         try:
-            with open(SETTINGS_PATH, "r") as f:
-                raw = json.load(f)
-        except Exception:
-            raw = {}
-        raw["tray_status"] = {
-            "value": settings["tray_status"],
-            "description": "0=Pause, 1=Tray Only, 2=Always On",
-        }
-        raw["startup"] = {
-            "value": settings["startup"],
-            "description": "0=Off, 1=On",
-        }
-        raw["app_menu"] = {
-            "value": settings["app_menu"],
-            "description": "0=Off, 1=On",
-        }
-        raw["alternate_hotkey"] = {
-            "value": settings["alternate_hotkey"],
-            "description": "Hotkey to trigger snip (e.g., 'ralt+rctrl+s')",
-        }
-        with open(SETTINGS_PATH, "w") as f:
-            json.dump(raw, f, indent=4)
-    except Exception as e:
-        print("Failed to save settings:", e)
+            try:
+                raw = read_raw_settings()
+            except Exception:
+                raw = {}
+            raw["tray_status"] = {
+                "value": settings["tray_status"],
+                "description": "0=Pause, 1=Tray Only, 2=Always On",
+            }
+            raw["startup"] = {
+                "value": settings["startup"],
+                "description": "0=Off, 1=On",
+            }
+            raw["app_menu"] = {
+                "value": settings["app_menu"],
+                "description": "0=Off, 1=On",
+            }
+            raw["alternate_hotkey"] = {
+                "value": settings["alternate_hotkey"],
+                "description": "Hotkey to trigger snip (e.g., 'ralt+rctrl+s')",
+            }
+            settings_cache["key"] = None
+            # Write aside and swap in, so the tray and watchdog never read a
+            # half-written file.
+            tmp_path = SETTINGS_PATH + ".tmp"
+            with open(tmp_path, "w") as f:
+                json.dump(raw, f, indent=4)
+            os.replace(tmp_path, SETTINGS_PATH)
+            settings_cache["raw"] = raw
+            settings_cache["key"] = settings_file_key()
+        except Exception as e:
+            logging.error(f"Failed to save settings: {e}")
+
+
+def write_if_changed(path, content):
+    """Write content to path unless the file already holds exactly that.
+
+    Skipping the no-op rewrite spares desktop shells watching the
+    directory a spurious reload.
+    """
+    try:
+        with open(path, "r") as f:
+            if f.read() == content:
+                return False
+    except OSError:
+        pass
+    with open(path, "w") as f:
+        f.write(content)
+    return True
 
 
 def create_autostart_entry():
@@ -128,8 +186,7 @@ def create_autostart_entry():
             "X-GNOME-Autostart-enabled=true\n"
             "Name=Snipping Lens\n"
         )
-        with open(DESKTOP_FILE, "w") as f:
-            f.write(content)
+        write_if_changed(DESKTOP_FILE, content)
         logging.info("Snipping Lens added to autostart.")
     except Exception as e:
         logging.error(f"Error adding Snipping Lens to autostart: {e}")
@@ -138,9 +195,10 @@ def create_autostart_entry():
 def remove_autostart_entry():
     """Remove the .desktop autostart entry for Snipping Lens."""
     try:
-        if os.path.exists(DESKTOP_FILE):
-            os.remove(DESKTOP_FILE)
-            logging.info("Snipping Lens removed from autostart.")
+        os.remove(DESKTOP_FILE)
+        logging.info("Snipping Lens removed from autostart.")
+    except FileNotFoundError:
+        pass
     except Exception as e:
         logging.error(f"Error removing Snipping Lens from autostart: {e}")
 
@@ -159,8 +217,7 @@ def create_app_menu_entry():
             "Comment=Screenshot to Google Lens\n"
             "Categories=Utility;\n"
         )
-        with open(APP_MENU_FILE, "w") as f:
-            f.write(content)
+        write_if_changed(APP_MENU_FILE, content)
         logging.info("Snipping Lens added to app menu.")
     except Exception as e:
         logging.error(f"Error adding Snipping Lens to app menu: {e}")
@@ -169,13 +226,80 @@ def create_app_menu_entry():
 def remove_app_menu_entry():
     """Remove the .desktop entry from ~/.local/share/applications/."""
     try:
-        if os.path.exists(APP_MENU_FILE):
-            os.remove(APP_MENU_FILE)
-            logging.info("Snipping Lens removed from app menu.")
+        os.remove(APP_MENU_FILE)
+        logging.info("Snipping Lens removed from app menu.")
+    except FileNotFoundError:
+        pass
     except Exception as e:
         logging.error(f"Error removing Snipping Lens from app menu: {e}")
 
 
+# Seconds the status toggle waits for further changes before saving.
+SAVE_DEBOUNCE = 0.3
+
+# With a change observer running, the log view only re-checks on this slow
+# tick as a backstop; without one it falls back to polling every second.
+LOG_RECHECK_INTERVAL = 5
+LOG_POLL_INTERVAL = 1
+
+
+# Enough for the last few log lines; the log itself keeps growing all session.
+LOG_TAIL_BYTES = 16384
+
+
+def read_log_tail(size, count):
+    """Return the last count lines of the log, reading only its tail."""
+    with open(LOG_FILE, "rb") as f:
+        offset = max(0, size - LOG_TAIL_BYTES)
+        f.seek(offset)
+        lines = f.read().decode("utf-8", errors="replace").splitlines(True)
+    if offset and lines:
+        # The first line was cut by the seek.
+        lines = lines[1:]
+    return lines[-count:]
+
+
+class LogChangeHandler(FileSystemEventHandler):
+    """Call notify whenever the log file changes."""
+
+    def __init__(self, notify):
+        super().__init__()
+        self.notify = notify
+
+    # Opens and reads, including the window's own tail reads, are ignored.
+    def on_created(self, event):
+        self.changed(event.src_path)
+
+    on_modified = on_created
+
+    def on_moved(self, event):
+        # Rotated away, or a new log moved into place.
+        self.changed(event.src_path)
+        self.changed(event.dest_path)
+
+    def changed(self, path):
+        if os.path.abspath(path) != LOG_FILE:
+            return
+        try:
+            self.notify()
+        except RuntimeError:
+            # The window's event loop has already closed.
+            pass
+
+
+def start_log_observer(notify):
+    try:
+        observer = Observer()
+        observer.schedule(
+            LogChangeHandler(notify), os.path.dirname(LOG_FILE), recursive=False
+        )
+        observer.start()
+        return observer
+    except Exception as e:
+        logging.warning(f"Could not watch the log file, polling instead: {e}")
+        return None
+
+
 def main(page: ft.Page):
     settings = load_settings()
     page.title = "Snipping Lens"
@@ -183,6 +307,8 @@ def main(page: ft.Page):
     page.window.height = 550
     page.window.min_width = 700
     page.window.min_height = 550
+    # Closing goes through on_window_event, so a pending save is flushed.
+    page.window.prevent_close = True
     page.window.center()
     page.horizontal_alignment = "center"
     page.vertical_alignment = "center"
@@ -198,13 +324,35 @@ def main(page: ft.Page):
         1: "#4285f4",
     }
 
+    # Sliding the status thumb across segments fires a change per segment;
+    # only the last one within SAVE_DEBOUNCE is written to disk.
+    save_seq = 0
+    saved_seq = 0
+
+    async def debounced_save(seq):
+        nonlocal saved_seq
+        await asyncio.sleep(SAVE_DEBOUNCE)
+        with settings_lock:
+            if seq == save_seq and saved_seq != seq:
+                saved_seq = seq
+                save_settings(settings)
+
+    def flush_pending_save():
+        nonlocal saved_seq
+        with settings_lock:
+            if saved_seq != save_seq:
+                saved_seq = save_seq
+                save_settings(settings)
+
     def on_status_toggle(e):
+        nonlocal save_seq
         idx = int(e.data)
         settings["tray_status"] = idx
-        save_settings(settings)
+        save_seq += 1
+        page.run_task(debounced_save, save_seq)
         status_toggle.selected_index = idx
         status_toggle.thumb_color = status_color_map[idx]
-        page.update()
+        status_toggle.update()
 
     status_toggle = ft.CupertinoSlidingSegmentedButton(
         selected_index=settings["tray_status"],
@@ -236,7 +384,7 @@ def main(page: ft.Page):
         else:
             remove_autostart_entry()
 
-        page.update()
+        startup_toggle.update()
 
     startup_toggle = ft.CupertinoSlidingSegmentedButton(
         selected_index=settings["startup"],
@@ -261,7 +409,7 @@ def main(page: ft.Page):
         else:
             remove_app_menu_entry()
 
-        page.update()
+        app_menu_toggle.update()
 
     app_menu_toggle = ft.CupertinoSlidingSegmentedButton(
         selected_index=settings["app_menu"],
@@ -286,16 +434,12 @@ def main(page: ft.Page):
         modifiers = []
         regular_keys = []
 
-        modifier_names = {
-            "lctrl", "rctrl", "lalt", "ralt", "lshift", "rshift",
-            "lwin", "rwin", "ctrl", "alt", "shift", "win",
-        }
-
         for key in keys:
-            if key.lower() in modifier_names:
-                modifiers.append(key.lower())
+            key = key.lower()
+            if key in DISPLAY_MODIFIERS:
+                modifiers.append(key)
             else:
-                regular_keys.append(key.lower())
+                regular_keys.append(key)
 
         modifiers = sorted(list(set(modifiers)))
         regular_keys = sorted(list(set(regular_keys)))
@@ -311,7 +455,7 @@ def main(page: ft.Page):
         hotkey_field.helper_text = "Click to capture new hotkey."
         is_capturing_hotkey[0] = False
         captured_keys.clear()
-        page.update()
+        hotkey_field.update()
         logging.info(f"Hotkey updated to: '{hotkey_str}'")
 
     def on_hotkey_field_click(e):
@@ -320,7 +464,7 @@ def main(page: ft.Page):
             captured_keys.clear()
             hotkey_field.value = "Recording keys..."
             hotkey_field.helper_text = "Press ENTER to save, and ESC to cancel."
-            page.update()
+            hotkey_field.update()
 
     def on_key_down(e):
         try:
@@ -334,7 +478,7 @@ def main(page: ft.Page):
                 hotkey_field.helper_text = "Hotkey cleared. Click to capture new hotkey."
                 is_capturing_hotkey[0] = False
                 captured_keys.clear()
-                page.update()
+                hotkey_field.update()
                 logging.info("Hotkey cleared.")
                 return
 
@@ -428,7 +572,7 @@ def main(page: ft.Page):
                 hotkey_field.value = current_display
             else:
                 hotkey_field.value = "Recording keys..."
-            page.update()
+            hotkey_field.update()
 
         except Exception as ex:
             logging.error(f"Error in hotkey capture: {ex}")
@@ -436,7 +580,7 @@ def main(page: ft.Page):
             hotkey_field.helper_text = "Click to capture new hotkey."
             is_capturing_hotkey[0] = False
             captured_keys.clear()
-            page.update()
+            hotkey_field.update()
 
     hotkey_field = ft.TextField(
         hint_text="Click to capture hotkey",
@@ -517,27 +661,63 @@ def main(page: ft.Page):
         )
     )
 
-    async def poll_log():
-        while True:
-            try:
-                if os.path.exists(LOG_FILE):
-                    with open(LOG_FILE, "r", encoding="utf-8") as f:
-                        lines = f.readlines()
-                        log_field.value = (
-                            "".join(lines[-10:]) if lines else "(Log empty.)"
-                        )
-                else:
-                    log_field.value = "(No log file found.)"
-            except Exception as e:
-                log_field.value = f"(Error reading log: {e})"
-            log_field.update()
-            await asyncio.sleep(1)
+    # The log view isn't redrawn while the window is minimized. Restoring it
+    # wakes poll_log, which catches up since last_stat was left stale.
+    log_view = {"hidden": False, "wake": None}
 
     def on_window_event(e):
-        if e.data == "close":
-            remove_lock()
+        if e.data == "minimize":
+            log_view["hidden"] = True
+        elif e.data in ("restore", "focus"):
+            log_view["hidden"] = False
+            if log_view["wake"]:
+                log_view["wake"]()
+        elif e.data == "close":
+            flush_pending_save()
+            page.window.destroy()
+
+    page.window.on_event = on_window_event
 
-    page.on_window_event = on_window_event
+    async def poll_log():
+        # One stat per tick; the log is only re-read and the field only
+        # redrawn when its size or mtime has changed since the last tick.
+        loop = asyncio.get_running_loop()
+        log_changed = asyncio.Event()
+        log_view["wake"] = lambda: loop.call_soon_threadsafe(log_changed.set)
+        observer = start_log_observer(log_view["wake"])
+        interval = LOG_RECHECK_INTERVAL if observer else LOG_POLL_INTERVAL
+        last_stat = ()
+        while True:
+            if log_view["hidden"]:
+                stat_key = last_stat
+            else:
+                try:
+                    st = os.stat(LOG_FILE)
+                    stat_key = (st.st_size, st.st_mtime_ns)
+                except OSError:
+                    stat_key = None
+            if stat_key != last_stat:
+                last_stat = stat_key
+                try:
+                    if stat_key is None:
+                        text = "(No log file found.)"
+                    else:
+                        # Off the event loop, so a slow disk can't stall the UI.
+                        lines = await asyncio.to_thread(
+                            read_log_tail, stat_key[0], 10
+                        )
+                        text = "".join(lines) if lines else "(Log empty.)"
+                except Exception as e:
+                    text = f"(Error reading log: {e})"
+                # A touch or a rewrite of the same tail needs no redraw.
+                if text != log_field.value:
+                    log_field.value = text
+                    log_field.update()
+            try:
+                await asyncio.wait_for(log_changed.wait(), interval)
+            except asyncio.TimeoutError:
+                pass
+            log_changed.clear()
 
     try:
         page.on_keyboard_event = on_key_down
@@ -551,8 +731,4 @@ def main(page: ft.Page):
     page.run_task(poll_log)
 
 
-write_pid_lock()
-try:
-    ft.app(target=main)
-finally:
-    remove_lock()
+ft.app(target=main)
@@ -0,0 +1,60 @@
+import os
+import time
+import fcntl
+
+
+class InstanceLock:
+    """Single-instance lock backed by an flock on a lockfile.
+
+    The descriptor stays open for the life of the process and the kernel
+    releases the lock when the process dies, so the file is never removed
+    and there is no stale-lock handling.
+    """
+
+    def __init__(self, path):
+        self.path = path
+        self.fd = None
+
+    def acquire(self):
+        """Take the lock and record our PID. Returns False if it is held."""
+        try:
+            fd = os.open(self.path, os.O_RDWR | os.O_CREAT, 0o644)
+        except OSError:
+            # No lockfile is no reason to refuse to start.
+            return True
+        # Another process's liveness probe holds a shared lock for an instant,
+        # so retry briefly before concluding an instance is already running.
+        for _ in range(3):
+            try:
+                fcntl.flock(fd, fcntl.LOCK_EX | fcntl.LOCK_NB)
+                break
+            except BlockingIOError:
+                time.sleep(0.05)
+        else:
+            os.close(fd)
+            return False
+        # Overwrite, then trim, so a reader never catches the file empty.
+        pid = str(os.getpid()).encode("ascii")
+        os.pwrite(fd, pid, 0)
+        os.ftruncate(fd, len(pid))
+        self.fd = fd
+        return True
+
+    @staticmethod
+    def held(path):
+        """True if a live process holds the lock on path.
+
+        The kernel drops a dead owner's lock, so a failed shared-lock attempt
+        proves liveness without trusting the PID written in the file.
+        """
+        try:
+            fd = os.open(path, os.O_RDONLY)
+        except OSError:
+            return False
+        try:
+            fcntl.flock(fd, fcntl.LOCK_SH | fcntl.LOCK_NB)
+            return False
+        except BlockingIOError:
+            return True
+        finally:
+            os.close(fd)
@@ -1,16 +1,17 @@
 import os
 import sys
 import json
-import atexit
-import subprocess
-import psutil
 import time
+import shutil
+import hashlib
+import subprocess
 import threading
 import webbrowser
-import requests
 import logging
 import signal
+from collections import OrderedDict
 
+from instance_lock import InstanceLock
 from watchdog.observers import Observer
 from watchdog.events import FileSystemEventHandler
 
@@ -32,12 +33,35 @@ SETTINGS_PATH = os.path.abspath(
     os.path.join(EXE_DIR, "..", "config", "settings.json")
 )
 LOCKFILE = os.path.join(EXE_DIR, ".tray_watchdog.lock")
+TRAY_LOCKFILE = os.path.join(EXE_DIR, ".sniplens.lock")
 LOG_FILE = os.path.abspath(os.path.join(EXE_DIR, "..", "logs", "sniplens.log"))
-SCREENSHOT_PATH = "/tmp/screenshot.png"
+# gnome-screenshot and spectacle can only write to a file, so give them one
+# on the per-user tmpfs rather than a fixed, world-shared name in /tmp.
+SCREENSHOT_PATH = os.path.join(
+    os.environ.get("XDG_RUNTIME_DIR") or "/tmp",
+    f"sniplens-screenshot-{os.getuid()}.png",
+)
 
 LITTERBOX_API = "https://litterbox.catbox.moe/resources/internals/api.php"
 GOOGLE_LENS_URL = "https://lens.google.com/uploadbyurl?url={}"
 
+# Screenshot tools and curl are resolved once so each snip execs them
+# without another $PATH search. A missing tool falls back to its bare name
+# so the FileNotFoundError handlers still report it as not installed.
+GNOME_SCREENSHOT_PATH = shutil.which("gnome-screenshot")
+SPECTACLE_PATH = shutil.which("spectacle")
+MAIM_PATH = shutil.which("maim")
+WAYSHOT_PATH = shutil.which("wayshot")
+CURL_PATH = shutil.which("curl")
+
+# Leading bytes of the image formats the screenshot tools can produce
+IMAGE_SIGNATURES = (
+    b"\x89PNG\r\n\x1a\n",
+    b"\xff\xd8\xff",
+    b"GIF8",
+    b"BM",
+)
+
 
 def is_gnome_desktop():
     desktop = os.environ.get("XDG_CURRENT_DESKTOP", "").strip()
@@ -76,36 +100,93 @@ def get_session_type():
     return ""
 
 
-def upload_to_litterbox_requests(image_path: str):
-    try:
-        with open(image_path, "rb") as f:
-            files = {
-                "reqtype": (None, "fileupload"),
-                "time": (None, "1h"),
-                "fileToUpload": ("snip.png", f, "image/png"),
-            }
-            response = requests.post(LITTERBOX_API, files=files, timeout=30)
+def detect_capture_backend():
+    """Return (use_gnome, use_kde, session_type) for the current desktop."""
+    use_gnome = is_gnome_desktop()
+    use_kde = (not use_gnome) and is_kde_desktop()
+    session_type = ""
+    if not use_gnome and not use_kde:
+        session_type = get_session_type()
+    return use_gnome, use_kde, session_type
 
-        if response.status_code == 200:
-            return response.text.strip()
 
-        logging.error(
-            f"[Litterbox] Upload failed with status: {response.status_code}"
-        )
+# The desktop environment doesn't change under a running process, so the
+# capture tool is chosen once rather than re-parsing the environment per snip.
+CAPTURE_BACKEND = detect_capture_backend()
+
+
+def looks_like_image(head: bytes):
+    """Cheap format check on the first bytes of a capture, without decoding it."""
+    return any(head.startswith(sig) for sig in IMAGE_SIGNATURES)
+
+
+# One keep-alive session for all uploads, so back-to-back snips reuse the
+# TLS connection to Litterbox. Created on first upload so requests is only
+# imported when a snip is actually sent.
+http_session = None
+
+
+def get_http_session():
+    global http_session
+    if http_session is None:
+        import requests
+
+        http_session = requests.Session()
+    return http_session
+
+
+# Recent uploads keyed by capture hash, so snipping the same unchanged
+# region again reopens Lens on its existing link instead of uploading it
+# again. Litterbox keeps files for an hour; entries are dropped a little
+# before that.
+URL_CACHE_MAX = 64
+URL_CACHE_TTL = 50 * 60
+url_cache = OrderedDict()
+
+
+def hash_capture(data):
+    return hashlib.blake2b(data, digest_size=16).hexdigest()
+
+
+def cached_upload_url(image_hash):
+    entry = url_cache.get(image_hash)
+    if entry is None:
         return None
-    except Exception as e:
+    url, uploaded_at = entry
+    if time.monotonic() - uploaded_at > URL_CACHE_TTL:
+        del url_cache[image_hash]
+        return None
+    url_cache.move_to_end(image_hash)
+    return url
+
+
+def remember_upload_url(image_hash, url):
+    url_cache[image_hash] = (url, time.monotonic())
+    url_cache.move_to_end(image_hash)
+    if len(url_cache) > URL_CACHE_MAX:
+        url_cache.popitem(last=False)
+
+
+def upload_to_litterbox_requests(image_path: str):
+    try:
+        with open(image_path, "rb") as f:
+            image_bytes = f.read()
+    except OSError as e:
         logging.error(f"[Litterbox] Upload error: {e}")
         return None
+    return upload_to_litterbox_requests_bytes(image_bytes)
 
 
-def upload_to_litterbox_requests_bytes(image_bytes: bytes):
+def upload_to_litterbox_requests_bytes(
+    image_bytes: bytes, filename="screenshot.png", mime="image/png"
+):
     try:
         files = {
             "reqtype": (None, "fileupload"),
             "time": (None, "1h"),
-            "fileToUpload": ("screenshot.png", image_bytes, "image/png"),
+            "fileToUpload": (filename, image_bytes, mime),
         }
-        response = requests.post(LITTERBOX_API, files=files, timeout=30)
+        response = get_http_session().post(LITTERBOX_API, files=files, timeout=30)
 
         if response.status_code == 200:
             return response.text.strip()
@@ -123,7 +204,7 @@ def upload_to_litterbox_curl(image_path: str):
     try:
         result = subprocess.run(
             [
-                "curl",
+                CURL_PATH or "curl",
                 "-sS",
                 "-F",
                 "reqtype=fileupload",
@@ -164,7 +245,7 @@ def upload_to_litterbox_curl_stdin(image_bytes: bytes):
     try:
         result = subprocess.run(
             [
-                "curl",
+                CURL_PATH or "curl",
                 "-sS",
                 "-F",
                 "reqtype=fileupload",
@@ -201,47 +282,21 @@ def upload_to_litterbox_curl_stdin(image_bytes: bytes):
     return url
 
 
-def singleton_lock():
-    if os.path.exists(LOCKFILE):
-        try:
-            with open(LOCKFILE, "r") as f:
-                pid = int(f.read().strip())
-            if psutil.pid_exists(pid):
-                proc = psutil.Process(pid)
-                if "python" in proc.name().lower() and any(
-                    "main.py" in part for part in proc.cmdline()
-                ):
-                    print(
-                        "main.py is already running (PID {}). Exiting.".format(pid)
-                    )
-                    sys.exit(0)
-        except Exception:
-            pass
-        try:
-            os.remove(LOCKFILE)
-        except Exception:
-            pass
-    with open(LOCKFILE, "w") as f:
-        f.write(str(os.getpid()))
+instance_lock = InstanceLock(LOCKFILE)
 
 
-def remove_lock():
-    try:
-        if os.path.exists(LOCKFILE):
-            os.remove(LOCKFILE)
-            logging.info("[Watchdog] Lockfile removed on clean exit.")
-    except Exception:
-        pass
+def singleton_lock():
+    if not instance_lock.acquire():
+        print("main.py is already running. Exiting.")
+        sys.exit(0)
 
 
 def signal_handler(signum, frame):
     logging.info(f"[Watchdog] Received signal {signum}, cleaning up...")
-    remove_lock()
     sys.exit(0)
 
 
 singleton_lock()
-atexit.register(remove_lock)
 
 signal.signal(signal.SIGTERM, signal_handler)
 signal.signal(signal.SIGINT, signal_handler)
@@ -256,6 +311,10 @@ logging.basicConfig(
 hotkey_listener = None
 current_hotkey = ""
 
+# Set when the watchdog shuts down; monitor threads wait on it instead of
+# sleeping so they notice the exit immediately.
+shutdown_event = threading.Event()
+
 # --- Settings helpers ---
 
 
@@ -377,11 +436,7 @@ def do_snip(from_tray=False):
         logging.info("[Snip] Tray Only mode but snip not from tray. Skipping.")
         return
 
-    use_gnome = is_gnome_desktop()
-    use_kde = (not use_gnome) and is_kde_desktop()
-    session_type = ""
-    if not use_gnome and not use_kde:
-        session_type = get_session_type()
+    use_gnome, use_kde, session_type = CAPTURE_BACKEND
 
     if use_gnome:
         logging.info(
@@ -398,16 +453,22 @@ def do_snip(from_tray=False):
     else:
         logging.info("[Snip] Detected X11 session, using maim...")
 
-    if session_type == "wayland":
+    # wayshot and maim can write the PNG to stdout, so their captures go
+    # straight to the upload without a round-trip through SCREENSHOT_PATH.
+    if session_type == "wayland" or not (use_gnome or use_kde):
+        if session_type == "wayland":
+            tool = "wayshot"
+            cmd = [WAYSHOT_PATH or "wayshot", "-g", "-"]
+        else:
+            tool = "maim"
+            # JPEG encodes faster than PNG and uploads several times
+            # smaller; Lens gets nothing from lossless pixels.
+            cmd = [MAIM_PATH or "maim", "-s", "-f", "jpg", "-m", "9"]
         try:
-            screenshot = subprocess.run(
-                ["wayshot", "-g", "-"],
-                timeout=120,
-                capture_output=True,
-            )
+            screenshot = subprocess.run(cmd, timeout=120, capture_output=True)
         except FileNotFoundError:
             logging.error(
-                "[Snip] wayshot is not installed. Please install wayshot."
+                "[Snip] %s is not installed. Please install %s.", tool, tool
             )
             return
         except subprocess.TimeoutExpired:
@@ -422,15 +483,29 @@ def do_snip(from_tray=False):
             return
 
         if not screenshot.stdout:
-            logging.error("[Snip] wayshot returned an empty screenshot.")
+            logging.error("[Snip] %s returned an empty screenshot.", tool)
             return
 
-        logging.info("[Litterbox] Uploading image...")
-        url = upload_to_litterbox_curl_stdin(screenshot.stdout)
-        if not url:
+        if not looks_like_image(screenshot.stdout[:12]):
+            logging.error("[Snip] %s output is not a recognized image.", tool)
             return
 
-        logging.info(f"[Litterbox] Upload success: {url}")
+        image_hash = hash_capture(screenshot.stdout)
+        url = cached_upload_url(image_hash)
+        if url:
+            logging.info(f"[Litterbox] Reusing earlier upload: {url}")
+        else:
+            logging.info("[Litterbox] Uploading image...")
+            if session_type == "wayland":
+                url = upload_to_litterbox_curl_stdin(screenshot.stdout)
+            else:
+                url = upload_to_litterbox_requests_bytes(
+                    screenshot.stdout, "screenshot.jpg", "image/jpeg"
+                )
+            if not url:
+                return
+            logging.info(f"[Litterbox] Upload success: {url}")
+            remember_upload_url(image_hash, url)
         update_settings({"last_litterbox_url": url})
 
         lens_url = GOOGLE_LENS_URL.format(url)
@@ -443,19 +518,18 @@ def do_snip(from_tray=False):
     try:
         if use_gnome:
             result = subprocess.run(
-                ["gnome-screenshot", "-a", "-f", SCREENSHOT_PATH],
-                timeout=120,
-            )
-            wrote_file = True
-        elif use_kde:
-            result = subprocess.run(
-                ["spectacle", "-rbn", "-o", SCREENSHOT_PATH],
+                [
+                    GNOME_SCREENSHOT_PATH or "gnome-screenshot",
+                    "-a",
+                    "-f",
+                    SCREENSHOT_PATH,
+                ],
                 timeout=120,
             )
             wrote_file = True
         else:
             result = subprocess.run(
-                ["maim", "-s", SCREENSHOT_PATH],
+                [SPECTACLE_PATH or "spectacle", "-rbn", "-o", SCREENSHOT_PATH],
                 timeout=120,
             )
             wrote_file = True
@@ -464,12 +538,10 @@ def do_snip(from_tray=False):
             logging.error(
                 "[Snip] gnome-screenshot is not installed. Please install gnome-screenshot."
             )
-        elif use_kde:
+        else:
             logging.error(
                 "[Snip] spectacle is not installed. Please install spectacle."
             )
-        else:
-            logging.error("[Snip] maim is not installed. Please install maim.")
         return
     except subprocess.TimeoutExpired:
         logging.error("[Snip] Screenshot selection timed out (120s). Skipping.")
@@ -482,22 +554,35 @@ def do_snip(from_tray=False):
         )
         return
 
-    if not os.path.exists(SCREENSHOT_PATH):
+    try:
+        with open(SCREENSHOT_PATH, "rb") as f:
+            data = f.read()
+    except OSError:
         logging.error("[Snip] Screenshot file not found after capture.")
         return
 
+    if not looks_like_image(data[:12]):
+        logging.error("[Snip] Screenshot file is not a recognized image.")
+        try:
+            os.remove(SCREENSHOT_PATH)
+        except OSError:
+            pass
+        return
+
+    image_hash = hash_capture(data)
+
     # Upload to Litterbox
-    logging.info("[Litterbox] Uploading image...")
     try:
-        if use_gnome or use_kde:
-            url = upload_to_litterbox_curl(SCREENSHOT_PATH)
+        url = cached_upload_url(image_hash)
+        if url:
+            logging.info(f"[Litterbox] Reusing earlier upload: {url}")
         else:
-            url = upload_to_litterbox_requests(SCREENSHOT_PATH)
-
-        if not url:
-            return
-
-        logging.info(f"[Litterbox] Upload success: {url}")
+            logging.info("[Litterbox] Uploading image...")
+            url = upload_to_litterbox_curl(SCREENSHOT_PATH)
+            if not url:
+                return
+            logging.info(f"[Litterbox] Upload success: {url}")
+            remember_upload_url(image_hash, url)
         update_settings({"last_litterbox_url": url})
 
         lens_url = GOOGLE_LENS_URL.format(url)
@@ -511,22 +596,33 @@ def do_snip(from_tray=False):
                 pass
 
 
+# Held while a snip is being captured and uploaded, so repeated triggers
+# can't stack up region selectors or concurrent uploads.
+snip_lock = threading.Lock()
+
+
+def start_snip(from_tray=False):
+    """Run do_snip on a background thread unless a snip is already running."""
+    if not snip_lock.acquire(blocking=False):
+        logging.info("[Snip] A snip is already in progress. Ignoring trigger.")
+        return
+
+    def run():
+        try:
+            do_snip(from_tray=from_tray)
+        finally:
+            snip_lock.release()
+
+    threading.Thread(target=run, daemon=True).start()
+
+
 # --- Tray process management ---
 
 
 def is_tray_running():
-    current_pid = os.getpid()
-    for proc in psutil.process_iter(["pid", "cmdline"]):
-        try:
-            pid = proc.info["pid"]
-            if pid == current_pid:
-                continue
-            cmdline = proc.info["cmdline"]
-            if cmdline and any("sniplens.py" in part for part in cmdline):
-                return True
-        except Exception:
-            continue
-    return False
+    # Polled once a second by the tray monitor; the tray holds an flock on
+    # its lockfile for as long as it runs.
+    return InstanceLock.held(TRAY_LOCKFILE)
 
 
 def launch_tray():
@@ -535,13 +631,16 @@ def launch_tray():
 
 
 def kill_tray():
-    for proc in psutil.process_iter(["pid", "cmdline"]):
-        try:
-            cmdline = proc.info["cmdline"]
-            if cmdline and any("sniplens.py" in part for part in cmdline):
-                proc.kill()
-        except Exception:
-            continue
+    # The tray writes its PID into the lockfile it holds, so there is no need
+    # to walk the process table looking for it.
+    if not InstanceLock.held(TRAY_LOCKFILE):
+        return
+    try:
+        with open(TRAY_LOCKFILE) as f:
+            pid = int(f.read().strip())
+        os.kill(pid, signal.SIGKILL)
+    except (OSError, ValueError):
+        pass
 
 
 # --- Hotkey handling ---
@@ -605,8 +704,7 @@ def setup_hotkey_listener():
 
         def on_hotkey():
             logging.info("[Hotkey] Hotkey triggered, starting snip...")
-            # Run snip in a separate thread so the hotkey listener isn't blocked
-            threading.Thread(target=do_snip, args=(False,), daemon=True).start()
+            start_snip(from_tray=False)
 
         hotkey_listener = keyboard.GlobalHotKeys({pynput_hotkey: on_hotkey})
         hotkey_listener.start()
@@ -630,30 +728,49 @@ def cleanup_hotkey_listener():
 # --- Monitor threads ---
 
 
-def snip_trigger_monitor():
-    """Watch for .do_snip trigger file from the tray process."""
-    while True:
-        if os.path.exists(EXIT_WATCHDOG):
-            break
+def consume_snip_trigger():
+    """Start a snip if the tray has left a .do_snip trigger file."""
+    # Removing the file doubles as the existence check, so duplicate
+    # filesystem events for one trigger only start one snip.
+    try:
+        os.remove(DO_SNIP_TRIGGER)
+    except OSError:
+        return
+
+    # Check for tray_snip_token
+    settings = get_settings()
+    tray_snip_token = settings.get("tray_snip_token")
+    is_tray_snip = bool(tray_snip_token)
+
+    if is_tray_snip:
+        logging.info(f"Consumed snip token: {tray_snip_token}")
+        update_settings({}, delete_keys=["tray_snip_token"])
+
+    start_snip(from_tray=is_tray_snip)
+
+
+class SnipTriggerHandler(FileSystemEventHandler):
+    """React to the tray's .do_snip file through inotify instead of polling."""
+
+    def on_created(self, event):
+        if os.path.abspath(event.src_path) == DO_SNIP_TRIGGER:
+            consume_snip_trigger()
+
+    on_modified = on_created
 
-        if os.path.exists(DO_SNIP_TRIGGER):
-            try:
-                os.remove(DO_SNIP_TRIGGER)
-            except OSError:
-                pass
 
-            # Check for tray_snip_token
-            settings = get_settings()
-            tray_snip_token = settings.get("tray_snip_token")
-            is_tray_snip = bool(tray_snip_token)
+# Fallback poll for the exit file in case its filesystem event is missed.
+EXIT_CHECK_INTERVAL = 2
 
-            if is_tray_snip:
-                logging.info(f"Consumed snip token: {tray_snip_token}")
-                update_settings({}, delete_keys=["tray_snip_token"])
 
-            do_snip(from_tray=is_tray_snip)
+class ExitTriggerHandler(FileSystemEventHandler):
+    """Wake the main loop as soon as .exit_watchdog appears."""
 
-        time.sleep(0.2)
+    def on_created(self, event):
+        if os.path.abspath(event.src_path) == EXIT_WATCHDOG:
+            shutdown_event.set()
+
+    on_modified = on_created
 
 
 def watchdog_tray_monitor():
@@ -661,39 +778,34 @@ def watchdog_tray_monitor():
     check_interval = 1
     max_missing = 5
 
-    while True:
-        if os.path.exists(EXIT_WATCHDOG):
-            break
-
+    while not shutdown_event.is_set():
         if not is_tray_running():
             missing_counter += 1
             if missing_counter >= max_missing:
                 logging.info("[Watchdog] Tray app missing. Signaling watchdog exit.")
                 with open(EXIT_WATCHDOG, "w") as f:
                     f.write("exit from tray monitor")
+                shutdown_event.set()
                 break
         else:
             missing_counter = 0
-        time.sleep(check_interval)
+        if shutdown_event.wait(check_interval):
+            break
 
 
 def hotkey_monitor_loop():
-    last_check_time = 0
     check_interval = 2
 
-    while True:
-        if os.path.exists(EXIT_WATCHDOG):
-            break
-
-        current_time = time.time()
-        if current_time - last_check_time >= check_interval:
-            try:
-                setup_hotkey_listener()
-            except Exception as e:
-                logging.error(f"[Hotkey] Error in hotkey monitor: {e}")
-            last_check_time = current_time
+    # shutdown_event.wait measures the interval on a monotonic clock, so there
+    # is no need to wake early and compare wall-clock timestamps.
+    while not shutdown_event.is_set():
+        try:
+            setup_hotkey_listener()
+        except Exception as e:
+            logging.error(f"[Hotkey] Error in hotkey monitor: {e}")
 
-        time.sleep(0.5)
+        if shutdown_event.wait(check_interval):
+            break
 
 
 class SettingsHandler(FileSystemEventHandler):
@@ -708,7 +820,14 @@ class SettingsHandler(FileSystemEventHandler):
         setup_hotkey_listener()
 
     def on_modified(self, event):
-        if os.path.abspath(event.src_path) == os.path.abspath(SETTINGS_PATH):
+        self.settings_changed(event.src_path)
+
+    def on_moved(self, event):
+        # The config window saves by replacing the file.
+        self.settings_changed(event.dest_path)
+
+    def settings_changed(self, path):
+        if os.path.abspath(path) == SETTINGS_PATH:
             current_state = tray_setting()
             if current_state != self.last_state:
                 if current_state:
@@ -731,14 +850,11 @@ if __name__ == "__main__":
     except OSError:
         pass
 
-    atexit.register(cleanup_hotkey_listener)
-
     if not is_tray_running():
         launch_tray()
 
     logging.info("[Watchdog] Starting background threads.")
 
-    threading.Thread(target=snip_trigger_monitor, daemon=True).start()
     threading.Thread(target=watchdog_tray_monitor, daemon=True).start()
 
     if HOTKEY_AVAILABLE:
@@ -751,11 +867,16 @@ if __name__ == "__main__":
     event_handler = SettingsHandler()
     watch_dir = os.path.dirname(SETTINGS_PATH)
     observer.schedule(event_handler, watch_dir, recursive=False)
+    observer.schedule(SnipTriggerHandler(), EXE_DIR, recursive=False)
+    observer.schedule(ExitTriggerHandler(), EXE_DIR, recursive=False)
     observer.start()
 
     try:
-        while not os.path.exists(EXIT_WATCHDOG):
-            time.sleep(0.2)
+        # ExitTriggerHandler sets shutdown_event when the exit file appears;
+        # the slow check only backs it up should the event be missed.
+        while not shutdown_event.wait(EXIT_CHECK_INTERVAL):
+            if os.path.exists(EXIT_WATCHDOG):
+                break
 
         logging.info("[Watchdog] Exit signal received. Shutting down.")
 
@@ -770,6 +891,7 @@ if __name__ == "__main__":
             f.write("exit from keyboard interrupt")
 
     finally:
+        shutdown_event.set()
         cleanup_hotkey_listener()
         observer.stop()
         observer.join()
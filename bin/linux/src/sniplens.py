@@ -3,22 +3,10 @@ import sys
 import json
 import subprocess
 import logging
-import atexit
 import uuid
 import signal
 
-import gi
-
-gi.require_version("Gtk", "3.0")
-from gi.repository import Gtk
-
-# Support both AppIndicator3 (Ubuntu/older) and AyatanaAppIndicator3 (Debian/newer)
-try:
-    gi.require_version("AppIndicator3", "0.1")
-    from gi.repository import AppIndicator3
-except ValueError:
-    gi.require_version("AyatanaAppIndicator3", "0.1")
-    from gi.repository import AyatanaAppIndicator3 as AppIndicator3
+from instance_lock import InstanceLock
 
 EXE_DIR = os.path.dirname(os.path.abspath(__file__))
 EXIT_WATCHDOG = os.path.join(EXE_DIR, ".exit_watchdog")
@@ -32,57 +20,36 @@ LOG_FILE = os.path.abspath(os.path.join(EXE_DIR, "..", "logs", "sniplens.log"))
 ICON_PATH = os.path.abspath(os.path.join(EXE_DIR, "..", "assets", "sniplens.png"))
 
 
-def _read_pid(path):
-    """Read a PID from a lockfile and check if it's alive."""
-    try:
-        with open(path, "r") as f:
-            pid = int(f.read().strip())
-        os.kill(pid, 0)  # Check if process exists (doesn't actually kill)
-        return pid
-    except (OSError, ValueError):
-        return None
+instance_lock = InstanceLock(LOCKFILE)
 
 
 def singleton_lock():
-    if os.path.exists(LOCKFILE):
-        pid = _read_pid(LOCKFILE)
-        if pid is not None:
-            # Check if it's actually sniplens.py by reading /proc/PID/cmdline
-            try:
-                with open(f"/proc/{pid}/cmdline", "rb") as f:
-                    cmdline = f.read().decode("utf-8", errors="replace")
-                if "sniplens.py" in cmdline:
-                    print(
-                        "sniplens.py is already running (PID {}). Exiting.".format(pid)
-                    )
-                    sys.exit(0)
-            except (OSError, IOError):
-                pass
-        try:
-            os.remove(LOCKFILE)
-        except OSError:
-            pass
-    with open(LOCKFILE, "w") as f:
-        f.write(str(os.getpid()))
-
-
-def remove_lock():
-    try:
-        if os.path.exists(LOCKFILE):
-            os.remove(LOCKFILE)
-            logging.info("sniplens.py lockfile removed on exit.")
-    except Exception:
-        pass
+    if not instance_lock.acquire():
+        print("sniplens.py is already running. Exiting.")
+        sys.exit(0)
 
 
 def signal_handler(signum, frame):
     logging.info(f"Received signal {signum}, cleaning up...")
-    remove_lock()
     Gtk.main_quit()
 
 
 singleton_lock()
-atexit.register(remove_lock)
+
+# GTK is imported only once the lock is held, so a duplicate launch exits
+# before paying for GObject introspection.
+import gi
+
+gi.require_version("Gtk", "3.0")
+from gi.repository import Gtk
+
+# Support both AppIndicator3 (Ubuntu/older) and AyatanaAppIndicator3 (Debian/newer)
+try:
+    gi.require_version("AppIndicator3", "0.1")
+    from gi.repository import AppIndicator3
+except ValueError:
+    gi.require_version("AyatanaAppIndicator3", "0.1")
+    from gi.repository import AyatanaAppIndicator3 as AppIndicator3
 
 signal.signal(signal.SIGTERM, signal_handler)
 signal.signal(signal.SIGINT, signal_handler)
@@ -109,21 +76,9 @@ def update_settings(updates: dict):
 
 
 def open_config_window():
-    if os.path.exists(LOCKFILE_APP):
-        pid = _read_pid(LOCKFILE_APP)
-        if pid is not None:
-            try:
-                with open(f"/proc/{pid}/cmdline", "rb") as f:
-                    cmdline = f.read().decode("utf-8", errors="replace")
-                if "config_window.py" in cmdline:
-                    logging.info("Config window already running.")
-                    return
-            except (OSError, IOError):
-                pass
-        try:
-            os.remove(LOCKFILE_APP)
-        except OSError:
-            pass
+    if InstanceLock.held(LOCKFILE_APP):
+        logging.info("Config window already running.")
+        return
 
     logging.info("Launching Snipping Lens config window.")
     subprocess.Popen([sys.executable, os.path.join(EXE_DIR, "config_window.py")])
@@ -168,7 +123,6 @@ def exit_app(_=None):
         f.write("exit")
 
     logging.info("Tray app exited by user.")
-    remove_lock()
     Gtk.main_quit()
 
 
@@ -207,10 +161,7 @@ def main():
 
     logging.info("Tray icon starting (AppIndicator3).")
 
-    try:
-        Gtk.main()
-    finally:
-        remove_lock()
+    Gtk.main()
 
 
 if __name__ == "__main__":
@@ -1,23 +1,51 @@
-import flet as ft
 import os
 import sys
 import json
+import ctypes
+from ctypes import wintypes
 import asyncio
+import threading
+import time
 import winshell
 import subprocess
 import shutil
+import filecmp
 import logging
+from watchdog.observers import Observer
+from watchdog.events import FileSystemEventHandler
 
 EXE_DIR = os.path.dirname(
     os.path.abspath(sys.executable if getattr(sys, "frozen", False) else __file__)
 )
-LOCKFILE = os.path.join(EXE_DIR, ".flet_config.lock")
 SETTINGS_PATH = os.path.abspath(os.path.join(EXE_DIR, "..", "config", "settings.json"))
 LOG_FILE = os.path.abspath(os.path.join(EXE_DIR, "..", "logs", "sniplens.log"))
 STARTUP = winshell.startup()
 VBS_PATH = os.path.abspath(os.path.join(EXE_DIR, "..", "..", "..", "create_lnk.vbs"))
 LNK_NAME = "Snipping Lens.lnk"
 LNK_PATH = os.path.abspath(os.path.join(EXE_DIR, "..", "..", "..", LNK_NAME))
+# What create_lnk.vbs points the shortcut at.
+RUN_VBS_PATH = os.path.abspath(os.path.join(EXE_DIR, "..", "run.vbs"))
+
+
+def shortcut_is_current():
+    """True if the shortcut exists and still targets this install's run.vbs.
+
+    The .lnk stores absolute paths, so it goes stale when the install
+    folder is moved.
+    """
+    if not os.path.exists(LNK_PATH):
+        return False
+    try:
+        target = winshell.shortcut(LNK_PATH).path
+    except Exception:
+        return False
+    return os.path.normcase(os.path.abspath(target)) == os.path.normcase(
+        RUN_VBS_PATH
+    )
+
+
+# Captured key names treated as modifiers in the hotkey display.
+DISPLAY_MODIFIERS = frozenset({"ctrl", "alt", "shift", "win", "cmd"})
 
 logging.basicConfig(
     filename=LOG_FILE,
@@ -25,26 +53,69 @@ logging.basicConfig(
     format="%(asctime)s [%(levelname)s] %(message)s",
 )
 
-def write_pid_lock():
-    try:
-        with open(LOCKFILE, "w") as f:
-            f.write(str(os.getpid()))
-    except Exception:
-        pass
+# Named mutex held while a config window is open. The tray probes it before
+# launching another window; the kernel frees it when the window exits.
+INSTANCE_MUTEX_NAME = "Local\\SnippingLensConfig"
+ERROR_ALREADY_EXISTS = 183
+
+kernel32 = ctypes.WinDLL("kernel32", use_last_error=True)
+kernel32.CreateMutexW.argtypes = [ctypes.c_void_p, wintypes.BOOL, wintypes.LPCWSTR]
+kernel32.CreateMutexW.restype = wintypes.HANDLE
+kernel32.CloseHandle.argtypes = [wintypes.HANDLE]
+kernel32.CloseHandle.restype = wintypes.BOOL
+
+# Kept open for the life of the process; closing it releases the lock.
+instance_mutex = None
+
+
+def singleton_lock():
+    global instance_mutex
+    handle = kernel32.CreateMutexW(None, False, INSTANCE_MUTEX_NAME)
+    if ctypes.get_last_error() == ERROR_ALREADY_EXISTS:
+        if handle:
+            kernel32.CloseHandle(handle)
+        logging.info("Config window already running. Exiting.")
+        sys.exit(0)
+    if not handle:
+        logging.error(
+            "Could not create instance mutex (error %d).", ctypes.get_last_error()
+        )
+    instance_mutex = handle
 
 
-def remove_lock():
-    try:
-        if os.path.exists(LOCKFILE):
-            os.remove(LOCKFILE)
-    except Exception:
-        pass
+singleton_lock()
+
+# Flet is imported only once the lock is held, so a duplicate launch exits
+# before loading it.
+import flet as ft
+
+
+# Raw settings as this window last read or wrote them, keyed by the file's
+# (mtime, size) at that moment. The watchdog and tray also write the file,
+# so it is re-read only once that key changes.
+settings_cache = {"key": None, "raw": None}
+# Flet runs sync handlers on a thread pool and async ones on its loop, so
+# saves can come from both; only one may write settings.json at a time.
+settings_lock = threading.RLock()
+
+
+def settings_file_key():
+    st = os.stat(SETTINGS_PATH)
+    return (st.st_mtime_ns, st.st_size)
+
+
+def read_raw_settings():
+    key = settings_file_key()
+    if key != settings_cache["key"]:
+        with open(SETTINGS_PATH, "r") as f:
+            settings_cache["raw"] = json.load(f)
+        settings_cache["key"] = key
+    return settings_cache["raw"]
 
 
 def load_settings():
     try:
-        with open(SETTINGS_PATH, "r") as f:
-            raw = json.load(f)
+        raw = read_raw_settings()
 
         def val(key, default):
             v = raw.get(key, default)
@@ -64,28 +135,125 @@ def load_settings():
 
 
 def save_settings(settings):
-    try:
+    with settings_lock:
         try:
-            with open(SETTINGS_PATH, "r") as f:
-                raw = json.load(f)
-        except Exception:
-            raw = {}
-        raw["tray_status"] = {
-            "value": settings["tray_status"],
-            "description": "0=Pause, 1=Tray Only, 2=Always On",
-        }
-        raw["startup"] = {
-            "value": settings["startup"],
-            "description": "0=Off, 1=On",
-        }
-        raw["alternate_hotkey"] = {
-            "value": settings["alternate_hotkey"],
-            "description": "Alternate hotkey for Windows Snipping Tool (e.g., 'ctrl+shift+s')",
-        }
-        with open(SETTINGS_PATH, "w") as f:
+            try:
+                raw = read_raw_settings()
+            except Exception:
+                raw = {}
+            raw["tray_status"] = {
+                "value": settings["tray_status"],
+                "description": "0=Pause, 1=Tray Only, 2=Always On",
+            }
+            raw["startup"] = {
+                "value": settings["startup"],
+                "description": "0=Off, 1=On",
+            }
+            raw["alternate_hotkey"] = {
+                "value": settings["alternate_hotkey"],
+                "description": "Alternate hotkey for Windows Snipping Tool (e.g., 'ctrl+shift+s')",
+            }
+            settings_cache["key"] = None
+            write_settings_file(raw)
+            settings_cache["raw"] = raw
+            settings_cache["key"] = settings_file_key()
+        except Exception as e:
+            logging.error(f"Failed to save settings: {e}")
+
+
+# Windows won't replace settings.json while the tray or watchdog has it open
+# for reading, so the swap is retried briefly before writing in place.
+REPLACE_RETRIES = 5
+REPLACE_BACKOFF = 0.02
+
+
+def write_settings_file(raw):
+    """Write aside and swap in, so readers never see a half-written file."""
+    tmp_path = SETTINGS_PATH + ".tmp"
+    try:
+        with open(tmp_path, "w") as f:
             json.dump(raw, f, indent=4)
+        for attempt in range(REPLACE_RETRIES):
+            try:
+                os.replace(tmp_path, SETTINGS_PATH)
+                return
+            except PermissionError:
+                time.sleep(REPLACE_BACKOFF * (attempt + 1))
+    finally:
+        try:
+            os.remove(tmp_path)
+        except OSError:
+            pass
+    logging.warning("settings.json stayed busy; writing it in place.")
+    with open(SETTINGS_PATH, "w") as f:
+        json.dump(raw, f, indent=4)
+
+
+# Seconds the status toggle waits for further changes before saving.
+SAVE_DEBOUNCE = 0.3
+
+# The change observer only speeds the log view up. Windows may not report
+# appends to a log the tray and watchdog hold open until the handle is
+# flushed, so the view keeps its one-second check as the backstop.
+LOG_RECHECK_INTERVAL = 1
+LOG_POLL_INTERVAL = 1
+
+
+# Enough for the last few log lines; the log itself keeps growing all session.
+LOG_TAIL_BYTES = 16384
+
+
+def read_log_tail(size, count):
+    """Return the last count lines of the log, reading only its tail."""
+    with open(LOG_FILE, "rb") as f:
+        offset = max(0, size - LOG_TAIL_BYTES)
+        f.seek(offset)
+        lines = f.read().decode("utf-8", errors="replace").splitlines(True)
+    if offset and lines:
+        # The first line was cut by the seek.
+        lines = lines[1:]
+    return lines[-count:]
+
+
+class LogChangeHandler(FileSystemEventHandler):
+    """Call notify whenever the log file changes."""
+
+    def __init__(self, notify):
+        super().__init__()
+        self.notify = notify
+
+    # Opens and reads, including the window's own tail reads, are ignored.
+    def on_created(self, event):
+        self.changed(event.src_path)
+
+    on_modified = on_created
+
+    def on_moved(self, event):
+        # Rotated away, or a new log moved into place.
+        self.changed(event.src_path)
+        self.changed(event.dest_path)
+
+    def changed(self, path):
+        if os.path.abspath(path) != LOG_FILE:
+            return
+        try:
+            self.notify()
+        except RuntimeError:
+            # The window's event loop has already closed.
+            pass
+
+
+def start_log_observer(notify):
+    try:
+        observer = Observer()
+        observer.schedule(
+            LogChangeHandler(notify), os.path.dirname(LOG_FILE), recursive=False
+        )
+        observer.start()
+        return observer
     except Exception as e:
-        print("Failed to save settings:", e)
+        logging.warning(f"Could not watch the log file, polling instead: {e}")
+        return None
 
 
 def main(page: ft.Page):
@@ -98,6 +266,8 @@ def main(page: ft.Page):
     page.window.height = 550
     page.window.min_width = 700
     page.window.min_height = 550
+    # Closing goes through on_window_event, so a pending save is flushed.
+    page.window.prevent_close = True
     page.window.center()
     page.horizontal_alignment = "center"
     page.vertical_alignment = "center"
@@ -113,13 +283,35 @@ def main(page: ft.Page):
         1: "#4285f4",
     }
 
+    # Sliding the status thumb across segments fires a change per segment;
+    # only the last one within SAVE_DEBOUNCE is written to disk.
+    save_seq = 0
+    saved_seq = 0
+
+    async def debounced_save(seq):
+        nonlocal saved_seq
+        await asyncio.sleep(SAVE_DEBOUNCE)
+        with settings_lock:
+            if seq == save_seq and saved_seq != seq:
+                saved_seq = seq
+                save_settings(settings)
+
+    def flush_pending_save():
+        nonlocal saved_seq
+        with settings_lock:
+            if saved_seq != save_seq:
+                saved_seq = save_seq
+                save_settings(settings)
+
     def on_status_toggle(e):
+        nonlocal save_seq
         idx = int(e.data)
         settings["tray_status"] = idx
-        save_settings(settings)
+        save_seq += 1
+        page.run_task(debounced_save, save_seq)
         status_toggle.selected_index = idx
         status_toggle.thumb_color = status_color_map[idx]
-        page.update()
+        status_toggle.update()
 
     status_toggle = ft.CupertinoSlidingSegmentedButton(
         selected_index=settings["tray_status"],
@@ -150,26 +342,34 @@ def main(page: ft.Page):
 
         if idx == 1:
             try:
-                subprocess.run(
-                    ["cscript", VBS_PATH],
-                    check=True,
-                    creationflags=subprocess.CREATE_NO_WINDOW,
-                )
+                # The installer already created the shortcut; only spawn
+                # cscript to recreate it when it is missing or stale.
+                if not shortcut_is_current():
+                    subprocess.run(
+                        ["cscript", VBS_PATH],
+                        check=True,
+                        creationflags=subprocess.CREATE_NO_WINDOW,
+                    )
                 if os.path.exists(LNK_PATH):
-                    shutil.copy(LNK_PATH, startup_lnk_path)
+                    if not (
+                        os.path.exists(startup_lnk_path)
+                        and filecmp.cmp(LNK_PATH, startup_lnk_path, shallow=False)
+                    ):
+                        shutil.copy(LNK_PATH, startup_lnk_path)
                     logging.info("Snipping Lens added to startup.")
             except (subprocess.CalledProcessError, FileNotFoundError, OSError) as ex:
                 logging.info("Error adding Snipping Lens to startup.")
 
         else:
             try:
-                if os.path.exists(startup_lnk_path):
-                    os.remove(startup_lnk_path)
-                    logging.info("Snipping Lens removed from startup.")
+                os.remove(startup_lnk_path)
+                logging.info("Snipping Lens removed from startup.")
+            except FileNotFoundError:
+                pass
             except OSError as ex:
                 logging.info("Error removing Snipping Lens from startup.")
 
-        page.update()
+        startup_toggle.update()
 
     startup_toggle = ft.CupertinoSlidingSegmentedButton(
         selected_index=settings["startup"],
@@ -196,10 +396,11 @@ def main(page: ft.Page):
         regular_keys = []
 
         for key in keys:
-            if key.lower() in ["ctrl", "alt", "shift", "win", "cmd"]:
-                modifiers.append(key.lower())
+            key = key.lower()
+            if key in DISPLAY_MODIFIERS:
+                modifiers.append(key)
             else:
-                regular_keys.append(key.lower())
+                regular_keys.append(key)
 
         # Remove duplicates and sort
         modifiers = sorted(list(set(modifiers)))
@@ -219,7 +420,7 @@ def main(page: ft.Page):
         )
         is_capturing_hotkey[0] = False
         captured_keys.clear()
-        page.update()
+        hotkey_field.update()
         logging.info(f"Alternate hotkey updated to: '{hotkey_str}'")
 
     def on_hotkey_field_click(e):
@@ -231,7 +432,7 @@ def main(page: ft.Page):
             hotkey_field.helper_text = (
                 "Press ENTER to save, and ESC to cancel."
             )
-            page.update()
+            hotkey_field.update()
 
     def on_key_down(e):
         """Handle keyboard events for hotkey capture"""
@@ -249,7 +450,7 @@ def main(page: ft.Page):
                 )
                 is_capturing_hotkey[0] = False
                 captured_keys.clear()
-                page.update()
+                hotkey_field.update()
                 logging.info("Alternate hotkey cleared.")
                 return
 
@@ -313,7 +514,7 @@ def main(page: ft.Page):
                 )
             else:
                 hotkey_field.value = "Recording keys..."
-            page.update()
+            hotkey_field.update()
 
         except Exception as ex:
             # Fallback error handling - log error and stop capturing
@@ -324,7 +525,7 @@ def main(page: ft.Page):
             )
             is_capturing_hotkey[0] = False
             captured_keys.clear()
-            page.update()
+            hotkey_field.update()
 
     hotkey_field = ft.TextField(
         hint_text="Click to capture hotkey",
@@ -398,27 +599,63 @@ def main(page: ft.Page):
         )
     )
 
-    async def poll_log():
-        while True:
-            try:
-                if os.path.exists(LOG_FILE):
-                    with open(LOG_FILE, "r", encoding="utf-8") as f:
-                        lines = f.readlines()
-                        log_field.value = (
-                            "".join(lines[-10:]) if lines else "(Log empty.)"
-                        )
-                else:
-                    log_field.value = "(No log file found.)"
-            except Exception as e:
-                log_field.value = f"(Error reading log: {e})"
-            log_field.update()
-            await asyncio.sleep(1)
+    # The log view isn't redrawn while the window is minimized. Restoring it
+    # wakes poll_log, which catches up since last_stat was left stale.
+    log_view = {"hidden": False, "wake": None}
 
     def on_window_event(e):
-        if e.data == "close":
-            remove_lock()
+        if e.data == "minimize":
+            log_view["hidden"] = True
+        elif e.data in ("restore", "focus"):
+            log_view["hidden"] = False
+            if log_view["wake"]:
+                log_view["wake"]()
+        elif e.data == "close":
+            flush_pending_save()
+            page.window.destroy()
+
+    page.window.on_event = on_window_event
 
-    page.on_window_event = on_window_event
+    async def poll_log():
+        # One stat per tick; the log is only re-read and the field only
+        # redrawn when its size or mtime has changed since the last tick.
+        loop = asyncio.get_running_loop()
+        log_changed = asyncio.Event()
+        log_view["wake"] = lambda: loop.call_soon_threadsafe(log_changed.set)
+        observer = start_log_observer(log_view["wake"])
+        interval = LOG_RECHECK_INTERVAL if observer else LOG_POLL_INTERVAL
+        last_stat = ()
+        while True:
+            if log_view["hidden"]:
+                stat_key = last_stat
+            else:
+                try:
+                    st = os.stat(LOG_FILE)
+                    stat_key = (st.st_size, st.st_mtime_ns)
+                except OSError:
+                    stat_key = None
+            if stat_key != last_stat:
+                last_stat = stat_key
+                try:
+                    if stat_key is None:
+                        text = "(No log file found.)"
+                    else:
+                        # Off the event loop, so a slow disk can't stall the UI.
+                        lines = await asyncio.to_thread(
+                            read_log_tail, stat_key[0], 10
+                        )
+                        text = "".join(lines) if lines else "(Log empty.)"
+                except Exception as e:
+                    text = f"(Error reading log: {e})"
+                # A touch or a rewrite of the same tail needs no redraw.
+                if text != log_field.value:
+                    log_field.value = text
+                    log_field.update()
+            try:
+                await asyncio.wait_for(log_changed.wait(), interval)
+            except asyncio.TimeoutError:
+                pass
+            log_changed.clear()
 
     # Try to set keyboard event handler, but don't fail if it's not supported
     try:
@@ -434,8 +671,4 @@ def main(page: ft.Page):
     page.run_task(poll_log)
 
 
-write_pid_lock()
-try:
-    ft.app(target=main)
-finally:
-    remove_lock()
+ft.app(target=main)
@@ -1,69 +1,82 @@
 import os
 import sys
 import json
+import ctypes
+from ctypes import wintypes
 import subprocess
-import psutil
 import logging
-import atexit
 import uuid
 import signal
 
-from PySide6.QtWidgets import QApplication, QSystemTrayIcon, QMenu
-from PySide6.QtGui import QIcon, QAction
-from PySide6.QtCore import QObject, QPoint
-
 EXE_DIR = os.path.dirname(
     os.path.abspath(sys.executable if getattr(sys, "frozen", False) else __file__)
 )
 EXIT_WATCHDOG = os.path.join(EXE_DIR, ".exit_watchdog")
 SETTINGS_PATH = os.path.abspath(os.path.join(EXE_DIR, "..", "config", "settings.json"))
-LOCKFILE_APP = os.path.join(EXE_DIR, ".flet_config.lock")
-LOCKFILE = os.path.join(EXE_DIR, ".sniplens.lock")
 LOG_FILE = os.path.abspath(os.path.join(EXE_DIR, "..", "logs", "sniplens.log"))
 
 
-def singleton_lock():
-    if os.path.exists(LOCKFILE):
-        try:
-            with open(LOCKFILE, "r") as f:
-                pid = int(f.read().strip())
-            if psutil.pid_exists(pid):
-                proc = psutil.Process(pid)
-                if "python" in proc.name().lower() and any(
-                    "sniplens.py" in part for part in proc.cmdline()
-                ):
-                    print(
-                        "sniplens.py is already running (PID {}). Exiting.".format(pid)
-                    )
-                    sys.exit(0)
-        except Exception:
-            pass
-        try:
-            os.remove(LOCKFILE)
-        except Exception:
-            pass
-    with open(LOCKFILE, "w") as f:
-        f.write(str(os.getpid()))
+# Named mutex guarding against a second instance. The kernel frees it when
+# the process dies, so there is no lockfile to clean up or go stale.
+INSTANCE_MUTEX_NAME = "Local\\SnippingLensTray"
+ERROR_ALREADY_EXISTS = 183
+SYNCHRONIZE = 0x00100000
+# Held by config_window.py while the window is open.
+CONFIG_MUTEX_NAME = "Local\\SnippingLensConfig"
+# Created by tray_watchdog.py; signaled after a tray snip is launched.
+SNIP_EVENT_NAME = "Local\\SnippingLensSnipLaunched"
+EVENT_MODIFY_STATE = 0x0002
+
+kernel32 = ctypes.WinDLL("kernel32", use_last_error=True)
+kernel32.CreateMutexW.argtypes = [ctypes.c_void_p, wintypes.BOOL, wintypes.LPCWSTR]
+kernel32.CreateMutexW.restype = wintypes.HANDLE
+kernel32.CloseHandle.argtypes = [wintypes.HANDLE]
+kernel32.CloseHandle.restype = wintypes.BOOL
+kernel32.OpenMutexW.argtypes = [wintypes.DWORD, wintypes.BOOL, wintypes.LPCWSTR]
+kernel32.OpenMutexW.restype = wintypes.HANDLE
+kernel32.OpenEventW.argtypes = [wintypes.DWORD, wintypes.BOOL, wintypes.LPCWSTR]
+kernel32.OpenEventW.restype = wintypes.HANDLE
+kernel32.SetEvent.argtypes = [wintypes.HANDLE]
+kernel32.SetEvent.restype = wintypes.BOOL
+
+# Kept open for the life of the process; closing it releases the lock.
+instance_mutex = None
 
 
-def remove_lock():
-    try:
-        if os.path.exists(LOCKFILE):
-            os.remove(LOCKFILE)
-            logging.info("sniplens.py lockfile removed on exit.")
-    except Exception:
-        pass
+def singleton_lock():
+    global instance_mutex
+    handle = kernel32.CreateMutexW(None, False, INSTANCE_MUTEX_NAME)
+    if ctypes.get_last_error() == ERROR_ALREADY_EXISTS:
+        if handle:
+            kernel32.CloseHandle(handle)
+        print("sniplens.py is already running. Exiting.")
+        sys.exit(0)
+    if not handle:
+        # Logging isn't configured yet; a failed lock shouldn't stop startup.
+        print("Could not create instance mutex (error %d)." % ctypes.get_last_error())
+    instance_mutex = handle
+
+
+def release_lock():
+    global instance_mutex
+    if instance_mutex:
+        kernel32.CloseHandle(instance_mutex)
+        instance_mutex = None
 
 
 def signal_handler(signum, frame):
     """Handle termination signals gracefully"""
     logging.info(f"Received signal {signum}, cleaning up...")
-    remove_lock()
     sys.exit(0)
 
 
 singleton_lock()
-atexit.register(remove_lock)
+
+# Qt is imported only once the lock is held, so a duplicate launch exits
+# before loading PySide6.
+from PySide6.QtWidgets import QApplication, QSystemTrayIcon, QMenu
+from PySide6.QtGui import QIcon, QAction
+from PySide6.QtCore import QObject, QPoint
 
 # Register signal handlers for proper cleanup
 signal.signal(signal.SIGTERM, signal_handler)
@@ -141,6 +154,9 @@ def load_settings():
         with open(SETTINGS_PATH, "w") as f:
             json.dump(DEFAULT_SETTINGS_WRAPPED, f, indent=4)
         python = sys.executable
+        # On Windows the exec'd copy is a new process that starts before this
+        # one exits; let go of the mutex so it doesn't see itself running.
+        release_lock()
         os.execl(python, python, *sys.argv)
 
 
@@ -160,21 +176,11 @@ def update_settings(updates: dict):
 
 
 def open_flet_window():
-    if os.path.exists(LOCKFILE_APP):
-        try:
-            with open(LOCKFILE_APP, "r") as f:
-                pid = int(f.read().strip())
-            if psutil.pid_exists(pid):
-                proc = psutil.Process(pid)
-                if "python" in proc.name().lower():
-                    logging.info("Application window already running.")
-                    return
-        except Exception:
-            pass
-        try:
-            os.remove(LOCKFILE_APP)
-        except Exception:
-            pass
+    handle = kernel32.OpenMutexW(SYNCHRONIZE, False, CONFIG_MUTEX_NAME)
+    if handle:
+        kernel32.CloseHandle(handle)
+        logging.info("Application window already running.")
+        return
     logging.info("Launching Snipping Lens main window.")
     subprocess.Popen([sys.executable, os.path.join(EXE_DIR, "config_window.py")])
 
@@ -244,6 +250,11 @@ class TrayApp(QObject):
 
                 logging.info("Launching Snipping Tool via ms-screenclip.")
                 subprocess.Popen(["explorer.exe", "ms-screenclip:"])
+                # Wake the watchdog's snipping-process scan right away.
+                handle = kernel32.OpenEventW(EVENT_MODIFY_STATE, False, SNIP_EVENT_NAME)
+                if handle:
+                    kernel32.SetEvent(handle)
+                    kernel32.CloseHandle(handle)
             except Exception as e:
                 logging.error(f"Failed to launch Snipping Tool: {e}")
 
@@ -277,15 +288,12 @@ class TrayApp(QObject):
         self.tray_icon.hide()
         logging.info("Tray app exited by user.")
 
-        # Clean up lockfile before exit
-        remove_lock()
-        os._exit(0)
+        # Leave the event loop and exit normally so logging flushes its
+        # handlers; the tray has no other threads to wait for.
+        self.app.quit()
 
     def run(self):
-        try:
-            self.app.exec()
-        finally:
-            remove_lock()
+        self.app.exec()
 
 
 if __name__ == "__main__":
@@ -1,17 +1,14 @@
 import os
 import sys
 import json
-import atexit
+import ctypes
+from ctypes import wintypes
 import subprocess
-import psutil
 import time
-import hashlib
-import copykitten
-from PIL import Image
-from io import BytesIO
-import requests
+import xxhash
 import threading
 import webbrowser
+from collections import OrderedDict
 from watchdog.observers import Observer
 from watchdog.events import FileSystemEventHandler
 import logging
@@ -19,7 +16,6 @@ import signal
 
 # Import for hotkey functionality
 try:
-    import pynput
     from pynput import keyboard
 
     HOTKEY_AVAILABLE = True
@@ -32,54 +28,49 @@ EXE_DIR = os.path.dirname(
 )
 EXIT_WATCHDOG = os.path.join(EXE_DIR, ".exit_watchdog")
 SETTINGS_PATH = os.path.abspath(os.path.join(EXE_DIR, "..", "config", "settings.json"))
-LOCKFILE = os.path.join(EXE_DIR, ".tray_watchdog.lock")
 LOG_FILE = os.path.abspath(os.path.join(EXE_DIR, "..", "logs", "sniplens.log"))
 
 
-def singleton_lock():
-    if os.path.exists(LOCKFILE):
-        try:
-            with open(LOCKFILE, "r") as f:
-                pid = int(f.read().strip())
-            if psutil.pid_exists(pid):
-                proc = psutil.Process(pid)
-                if "python" in proc.name().lower() and any(
-                    "tray_watchdog.py" in part for part in proc.cmdline()
-                ):
-                    print(
-                        "tray_watchdog.py is already running (PID {}). Exiting.".format(
-                            pid
-                        )
-                    )
-                    sys.exit(0)
-        except Exception:
-            pass
-        try:
-            os.remove(LOCKFILE)
-        except Exception:
-            pass
-    with open(LOCKFILE, "w") as f:
-        f.write(str(os.getpid()))
+# Named mutex guarding against a second instance. The kernel frees it when
+# the process dies, so there is no lockfile to clean up or go stale.
+INSTANCE_MUTEX_NAME = "Local\\SnippingLensWatchdog"
+ERROR_ALREADY_EXISTS = 183
+# Held by sniplens.py for as long as the tray is running.
+TRAY_MUTEX_NAME = "Local\\SnippingLensTray"
 
+kernel32 = ctypes.WinDLL("kernel32", use_last_error=True)
+kernel32.CreateMutexW.argtypes = [ctypes.c_void_p, wintypes.BOOL, wintypes.LPCWSTR]
+kernel32.CreateMutexW.restype = wintypes.HANDLE
+kernel32.CloseHandle.argtypes = [wintypes.HANDLE]
+kernel32.CloseHandle.restype = wintypes.BOOL
+kernel32.OpenMutexW.argtypes = [wintypes.DWORD, wintypes.BOOL, wintypes.LPCWSTR]
+kernel32.OpenMutexW.restype = wintypes.HANDLE
 
-def remove_lock():
-    try:
-        if os.path.exists(LOCKFILE):
-            os.remove(LOCKFILE)
-            logging.info("[Watchdog] Lockfile removed on clean exit.")
-    except Exception:
-        pass
+# Kept open for the life of the process; closing it releases the lock.
+instance_mutex = None
+
+
+def singleton_lock():
+    global instance_mutex
+    handle = kernel32.CreateMutexW(None, False, INSTANCE_MUTEX_NAME)
+    if ctypes.get_last_error() == ERROR_ALREADY_EXISTS:
+        if handle:
+            kernel32.CloseHandle(handle)
+        print("tray_watchdog.py is already running. Exiting.")
+        sys.exit(0)
+    if not handle:
+        # Logging isn't configured yet; a failed lock shouldn't stop startup.
+        print("Could not create instance mutex (error %d)." % ctypes.get_last_error())
+    instance_mutex = handle
 
 
 def signal_handler(signum, frame):
     """Handle termination signals gracefully"""
     logging.info(f"[Watchdog] Received signal {signum}, cleaning up...")
-    remove_lock()
     sys.exit(0)
 
 
 singleton_lock()
-atexit.register(remove_lock)
 
 # Register signal handlers for proper cleanup
 signal.signal(signal.SIGTERM, signal_handler)
@@ -95,6 +86,44 @@ logging.basicConfig(
 hotkey_listener = None
 current_hotkey = ""
 
+# Set when the watchdog shuts down; monitor threads wait on it instead of
+# sleeping so they notice the exit immediately.
+shutdown_event = threading.Event()
+
+# Snipping process scans back off while nothing is happening and snap back
+# to the fast interval once a snip is seen or launched. The cap stays short
+# enough that a quick Win+Shift+S snip is still caught while it is open.
+SNIP_SCAN_MIN_INTERVAL = 0.2
+SNIP_SCAN_MAX_INTERVAL = 0.5
+# Auto-reset named event signaled by the alternate hotkey and by the tray
+# right after they launch a snip, so the scan wakes immediately from its
+# back-off instead of finding the new process on its next tick.
+SNIP_EVENT_NAME = "Local\\SnippingLensSnipLaunched"
+WAIT_OBJECT_0 = 0
+
+kernel32.CreateEventW.argtypes = [
+    ctypes.c_void_p,
+    wintypes.BOOL,
+    wintypes.BOOL,
+    wintypes.LPCWSTR,
+]
+kernel32.CreateEventW.restype = wintypes.HANDLE
+kernel32.SetEvent.argtypes = [wintypes.HANDLE]
+kernel32.SetEvent.restype = wintypes.BOOL
+kernel32.WaitForSingleObject.argtypes = [wintypes.HANDLE, wintypes.DWORD]
+kernel32.WaitForSingleObject.restype = wintypes.DWORD
+
+snip_launched_event = kernel32.CreateEventW(None, False, False, SNIP_EVENT_NAME)
+
+
+def wait_for_snip_launch(timeout):
+    """Wait up to timeout seconds for a snip launch. True if one was signaled."""
+    if not snip_launched_event:
+        shutdown_event.wait(timeout)
+        return False
+    rc = kernel32.WaitForSingleObject(snip_launched_event, int(timeout * 1000))
+    return rc == WAIT_OBJECT_0
+
 try:
     if os.path.exists(SETTINGS_PATH):
         with open(SETTINGS_PATH, "r") as f:
@@ -124,18 +153,13 @@ except Exception as e:
 
 
 def is_tray_running():
-    current_pid = os.getpid()
-    for proc in psutil.process_iter(["pid", "cmdline"]):
-        try:
-            pid = proc.info["pid"]
-            if pid == current_pid:
-                continue
-            cmdline = proc.info["cmdline"]
-            if cmdline and any("sniplens.py" in part for part in cmdline):
-                return True
-        except Exception:
-            continue
-    return False
+    """Probe the tray's instance mutex instead of walking every process's
+    cmdline; this is polled once a second by the tray monitor."""
+    handle = kernel32.OpenMutexW(SYNCHRONIZE, False, TRAY_MUTEX_NAME)
+    if not handle:
+        return False
+    kernel32.CloseHandle(handle)
+    return True
 
 
 def tray_setting():
@@ -168,13 +192,12 @@ def launch_snipping_tool():
     try:
         logging.info("[Hotkey] Launching Snipping Tool via alternate hotkey.")
         subprocess.Popen(["explorer.exe", "ms-screenclip:"])
+        if snip_launched_event:
+            kernel32.SetEvent(snip_launched_event)
     except Exception as e:
         logging.error(f"[Hotkey] Failed to launch Snipping Tool: {e}")
 
 
-# Remove the old parse_hotkey function since we're not using it anymore
-
-
 def setup_hotkey_listener():
     """Setup or update the hotkey listener"""
     global hotkey_listener, current_hotkey
@@ -244,40 +267,267 @@ def launch_tray():
 
 
 def kill_tray():
-    for proc in psutil.process_iter(["pid", "cmdline"]):
+    # Imported lazily: only needed when the tray is switched off.
+    import psutil
+
+    # The name comes straight from the process list; only python processes
+    # are worth the much costlier command-line read.
+    for proc in psutil.process_iter(["name"]):
         try:
-            cmdline = proc.info["cmdline"]
+            name = (proc.info["name"] or "").lower()
+            if not name.startswith("python"):
+                continue
+            cmdline = proc.cmdline()
             if cmdline and any("sniplens.py" in part for part in cmdline):
                 proc.kill()
         except Exception:
             continue
 
 
+SNIPPING_PROCESS_NAMES = frozenset(
+    {
+        "snippingtool.exe",
+        "screenclippinghost.exe",
+        "sniptool.exe",
+        "snipandsketch.exe",
+    }
+)
+
+TH32CS_SNAPPROCESS = 0x00000002
+SYNCHRONIZE = 0x00100000
+WAIT_TIMEOUT = 0x00000102
+WAIT_FAILED = 0xFFFFFFFF
+MAXIMUM_WAIT_OBJECTS = 64
+CF_DIB = 8
+INVALID_HANDLE_VALUE = ctypes.c_void_p(-1).value
+
+
+class PROCESSENTRY32W(ctypes.Structure):
+    _fields_ = [
+        ("dwSize", wintypes.DWORD),
+        ("cntUsage", wintypes.DWORD),
+        ("th32ProcessID", wintypes.DWORD),
+        ("th32DefaultHeapID", ctypes.c_void_p),
+        ("th32ModuleID", wintypes.DWORD),
+        ("cntThreads", wintypes.DWORD),
+        ("th32ParentProcessID", wintypes.DWORD),
+        ("pcPriClassBase", ctypes.c_long),
+        ("dwFlags", wintypes.DWORD),
+        ("szExeFile", ctypes.c_wchar * 260),
+    ]
+
+
+kernel32.CreateToolhelp32Snapshot.argtypes = [wintypes.DWORD, wintypes.DWORD]
+kernel32.CreateToolhelp32Snapshot.restype = wintypes.HANDLE
+kernel32.Process32FirstW.argtypes = [wintypes.HANDLE, ctypes.POINTER(PROCESSENTRY32W)]
+kernel32.Process32FirstW.restype = wintypes.BOOL
+kernel32.Process32NextW.argtypes = [wintypes.HANDLE, ctypes.POINTER(PROCESSENTRY32W)]
+kernel32.Process32NextW.restype = wintypes.BOOL
+kernel32.OpenProcess.argtypes = [wintypes.DWORD, wintypes.BOOL, wintypes.DWORD]
+kernel32.OpenProcess.restype = wintypes.HANDLE
+kernel32.WaitForMultipleObjects.argtypes = [
+    wintypes.DWORD,
+    ctypes.POINTER(wintypes.HANDLE),
+    wintypes.BOOL,
+    wintypes.DWORD,
+]
+kernel32.WaitForMultipleObjects.restype = wintypes.DWORD
+
+user32 = ctypes.WinDLL("user32", use_last_error=True)
+user32.GetClipboardSequenceNumber.argtypes = []
+user32.GetClipboardSequenceNumber.restype = wintypes.DWORD
+user32.OpenClipboard.argtypes = [wintypes.HWND]
+user32.OpenClipboard.restype = wintypes.BOOL
+user32.CloseClipboard.argtypes = []
+user32.CloseClipboard.restype = wintypes.BOOL
+user32.GetClipboardData.argtypes = [wintypes.UINT]
+user32.GetClipboardData.restype = wintypes.HANDLE
+user32.IsClipboardFormatAvailable.argtypes = [wintypes.UINT]
+user32.IsClipboardFormatAvailable.restype = wintypes.BOOL
+kernel32.GlobalLock.argtypes = [wintypes.HGLOBAL]
+kernel32.GlobalLock.restype = ctypes.c_void_p
+kernel32.GlobalUnlock.argtypes = [wintypes.HGLOBAL]
+kernel32.GlobalUnlock.restype = wintypes.BOOL
+kernel32.GlobalSize.argtypes = [wintypes.HGLOBAL]
+kernel32.GlobalSize.restype = ctypes.c_size_t
+
+
+def _iter_snip_pids():
+    """Yield PIDs of running snipping processes from a Toolhelp32 snapshot."""
+    snapshot = kernel32.CreateToolhelp32Snapshot(TH32CS_SNAPPROCESS, 0)
+    if not snapshot or snapshot == INVALID_HANDLE_VALUE:
+        return
+    try:
+        entry = PROCESSENTRY32W()
+        entry.dwSize = ctypes.sizeof(PROCESSENTRY32W)
+        ok = kernel32.Process32FirstW(snapshot, ctypes.byref(entry))
+        while ok:
+            if entry.szExeFile.lower() in SNIPPING_PROCESS_NAMES:
+                yield entry.th32ProcessID
+            ok = kernel32.Process32NextW(snapshot, ctypes.byref(entry))
+    finally:
+        kernel32.CloseHandle(snapshot)
+
+
+def _enumerate_snip_handles():
+    """Open a SYNCHRONIZE handle for every running snipping process."""
+    handles = []
+    for pid in _iter_snip_pids():
+        handle = kernel32.OpenProcess(SYNCHRONIZE, False, pid)
+        if handle:
+            handles.append(handle)
+        if len(handles) >= MAXIMUM_WAIT_OBJECTS:
+            break
+    return handles
+
+
+def _close_handles(handles):
+    for handle in handles:
+        kernel32.CloseHandle(handle)
+
+
 def snippingtool_running():
-    for proc in psutil.process_iter(["name"]):
-        try:
-            if proc.info["name"] and proc.info["name"].lower() in [
-                "snippingtool.exe",
-                "screenclippinghost.exe",
-                "sniptool.exe",
-                "snipandsketch.exe",
-            ]:
-                return True
-        except Exception:
-            continue
+    for _ in _iter_snip_pids():
+        return True
     return False
 
 
-def md5_image(pixels):
-    return hashlib.md5(pixels).hexdigest()
+SNIP_EXITED = "exited"
+SNIP_COPIED = "copied"
+
+
+def wait_for_snippingtool_exit(handles, seq=0):
+    """Block until a snipping process exits or the clipboard changes.
+
+    Returns SNIP_EXITED when any of the handles is signaled, SNIP_COPIED
+    when the clipboard sequence number moves away from seq (the snipping
+    tool may stay open after copying), or None on watchdog shutdown.
+    """
+    handle_array = (wintypes.HANDLE * len(handles))(*handles)
+    while not shutdown_event.is_set():
+        rc = kernel32.WaitForMultipleObjects(
+            len(handles), handle_array, False, 250
+        )
+        if rc == WAIT_TIMEOUT:
+            # One cheap counter read per tick instead of a clipboard open.
+            if seq and user32.GetClipboardSequenceNumber() != seq:
+                return SNIP_COPIED
+            continue
+        if rc == WAIT_FAILED:
+            logging.error(
+                "[SnippingTool] WaitForMultipleObjects failed (error %d).",
+                ctypes.get_last_error(),
+            )
+        return SNIP_EXITED
+    return None
+
+
+def hash_image(data):
+    # xxh3 runs at memory bandwidth; MD5's cryptographic strength buys nothing
+    # for spotting a repeated clipboard image.
+    return xxhash.xxh3_64(data).hexdigest()
+
+
+def dib_header_valid(header, size):
+    """Sanity-check the BITMAPINFOHEADER so a bogus bitmap is rejected here,
+    alongside the hash, instead of after it has been recorded as seen."""
+    if size < 40:
+        return False
+    header_size = int.from_bytes(header[0:4], "little")
+    width = int.from_bytes(header[4:8], "little", signed=True)
+    height = int.from_bytes(header[8:12], "little", signed=True)
+    bit_count = int.from_bytes(header[14:16], "little")
+    return (
+        40 <= header_size <= size
+        and width > 0
+        and height != 0
+        and bit_count in (1, 4, 8, 16, 24, 32)
+    )
+
+
+BI_RGB = 0
+BI_BITFIELDS = 3
+BI_ALPHABITFIELDS = 6
+
+
+def dib_length(header, size):
+    """Bytes the DIB actually uses, clamped to its allocation of size bytes.
+
+    GlobalSize rounds the allocation up and the slack is not initialised,
+    so hashing all of it could give the same snip different hashes.
+    """
+    header_size = int.from_bytes(header[0:4], "little")
+    width = int.from_bytes(header[4:8], "little", signed=True)
+    height = int.from_bytes(header[8:12], "little", signed=True)
+    bit_count = int.from_bytes(header[14:16], "little")
+    compression = int.from_bytes(header[16:20], "little")
+    size_image = int.from_bytes(header[20:24], "little")
+    clr_used = int.from_bytes(header[32:36], "little")
+
+    length = header_size
+    # Later header versions carry the masks inside the header itself.
+    if header_size == 40:
+        if compression == BI_BITFIELDS:
+            length += 12
+        elif compression == BI_ALPHABITFIELDS:
+            length += 16
+    if clr_used:
+        length += clr_used * 4
+    elif bit_count <= 8:
+        length += (1 << bit_count) * 4
+    if compression in (BI_RGB, BI_BITFIELDS, BI_ALPHABITFIELDS):
+        stride = (width * bit_count + 31) // 32 * 4
+        length += stride * abs(height)
+    else:
+        length += size_image
+    return min(length, size)
+
 
+def grab_clipboard_image_and_hash(known_hash=None):
+    """Hash the clipboard's CF_DIB where the OS keeps it.
 
-def grab_clipboard_image_and_hash():
+    Returns (hash, dib_bytes), or (None, None) if there is no valid bitmap.
+    The bitmap is copied out of the clipboard only when its hash differs
+    from known_hash; for a repeat, dib_bytes is None.
+    """
+    # Answered without opening the clipboard, so a text copy costs nothing
+    # and never contends with the app that owns it. CF_DIB is synthesized
+    # from CF_BITMAP, so this covers both.
+    if not user32.IsClipboardFormatAvailable(CF_DIB):
+        return None, None
+    # The snipping tool may still hold the clipboard for a moment after exit.
+    for _ in range(10):
+        if user32.OpenClipboard(None):
+            break
+        time.sleep(0.015)
+    else:
+        return None, None
     try:
-        pixels, width, height = copykitten.paste_image()
-        return md5_image(pixels), (pixels, width, height)
+        handle = user32.GetClipboardData(CF_DIB)
+        if not handle:
+            return None, None
+        ptr = kernel32.GlobalLock(handle)
+        if not ptr:
+            return None, None
+        try:
+            size = kernel32.GlobalSize(handle)
+            if size < 40:
+                return None, None
+            header = ctypes.string_at(ptr, 40)
+            if not dib_header_valid(header, size):
+                return None, None
+            length = dib_length(header, size)
+            view = (ctypes.c_char * length).from_address(ptr)
+            hash_val = hash_image(view)
+            if hash_val == known_hash:
+                return hash_val, None
+            return hash_val, bytes(view)
+        finally:
+            kernel32.GlobalUnlock(handle)
     except Exception:
         return None, None
+    finally:
+        user32.CloseClipboard()
 
 
 def get_settings():
@@ -317,122 +567,249 @@ def update_settings(updates: dict, delete_keys: list = None):
         logging.error("Failed to update settings: %s", e)
 
 
-def clipboard_monitor_loop():
-    last_snip_running = False
-    last_hash = get_settings().get("last_detected_image", "")
-    while True:
-        if os.path.exists(EXIT_WATCHDOG):
-            break
+# Lens gains nothing from larger images, so high-DPI snips are scaled down
+# to this longest side before encoding, shrinking both the PNG and upload.
+MAX_LENS_UPLOAD_DIM = 1600
 
-        now_running = snippingtool_running()
+# One keep-alive session for all uploads, so back-to-back snips reuse the
+# TLS connection to Litterbox. Created on first upload so requests is only
+# imported when a snip is actually sent.
+http_session = None
 
-        if last_snip_running and not now_running:
-            logging.info("[SnippingTool] Detected close. Checking clipboard...")
-            hash_val, image_data = grab_clipboard_image_and_hash()
 
-            settings = get_settings()
-            tray_snip_token = settings.get("tray_snip_token")
-            is_tray_snip = bool(tray_snip_token)
+def get_http_session():
+    global http_session
+    if http_session is None:
+        import requests
+
+        http_session = requests.Session()
+    return http_session
+
+
+# Recent uploads keyed by image hash, so flipping back to an earlier snip
+# reopens Lens on its existing link instead of uploading it again. Litterbox
+# keeps files for an hour; entries are dropped a little before that.
+URL_CACHE_MAX = 64
+URL_CACHE_TTL = 50 * 60
+url_cache = OrderedDict()
+
+
+def cached_upload_url(image_hash):
+    entry = url_cache.get(image_hash)
+    if entry is None:
+        return None
+    url, uploaded_at = entry
+    if time.monotonic() - uploaded_at > URL_CACHE_TTL:
+        del url_cache[image_hash]
+        return None
+    url_cache.move_to_end(image_hash)
+    return url
+
+
+def remember_upload_url(image_hash, url):
+    url_cache[image_hash] = (url, time.monotonic())
+    url_cache.move_to_end(image_hash)
+    if len(url_cache) > URL_CACHE_MAX:
+        url_cache.popitem(last=False)
+
+
+def open_google_lens(url):
+    lens_url = f"https://lens.google.com/uploadbyurl?url={url}"
+    logging.info(f"[Google Lens] Opening: {lens_url}")
+    webbrowser.open_new_tab(lens_url)
+
 
-            if is_tray_snip:
-                logging.info(f"Consumed snip token: {tray_snip_token}")
-                # Atomically consume the token by deleting it from settings
-                update_settings({}, delete_keys=["tray_snip_token"])
+THREAD_PRIORITY_BELOW_NORMAL = -1
 
-            if hash_val and hash_val != last_hash:
-                logging.info("[SnippingTool] New clipboard image found.")
-                update_settings({"last_detected_image": hash_val})
-                tray_status = get_tray_status()
+kernel32.GetCurrentThread.restype = wintypes.HANDLE
+kernel32.SetThreadPriority.argtypes = [wintypes.HANDLE, ctypes.c_int]
+kernel32.SetThreadPriority.restype = wintypes.BOOL
 
-                do_upload = tray_status == 2 or (tray_status == 1 and is_tray_snip)
-                do_open_lens = do_upload
 
-                if do_upload and image_data is not None:
-                    pixels, width, height = image_data
-                    img = Image.frombytes(
-                        mode="RGBA", size=(width, height), data=pixels
+def lower_thread_priority():
+    """Let the calling background thread yield to the user's foreground work."""
+    kernel32.SetThreadPriority(
+        kernel32.GetCurrentThread(), THREAD_PRIORITY_BELOW_NORMAL
+    )
+
+
+def clipboard_monitor_loop():
+    lower_thread_priority()
+    idle_ticks = 0
+    last_hash = get_settings().get("last_detected_image", "")
+    # Clipboard sequence number as of the last grab. The OS bumps it on every
+    # clipboard write, so an unchanged value when the snipping tool exits
+    # means nothing was copied since and the grab + hash can be skipped. It
+    # is not re-read when a session is first seen, since a quick snip may
+    # already have copied by then. 0 means the counter is unavailable.
+    last_checked_seq = user32.GetClipboardSequenceNumber()
+    while not shutdown_event.is_set():
+        handles = _enumerate_snip_handles()
+        if not handles:
+            interval = min(
+                SNIP_SCAN_MAX_INTERVAL,
+                SNIP_SCAN_MIN_INTERVAL * (1.25**idle_ticks),
+            )
+            if wait_for_snip_launch(interval):
+                idle_ticks = 0
+            else:
+                idle_ticks += 1
+            continue
+
+        idle_ticks = 0
+        try:
+            reason = wait_for_snippingtool_exit(handles, last_checked_seq)
+        finally:
+            _close_handles(handles)
+        if reason is None:
+            break
+
+        if reason == SNIP_EXITED:
+            # Another snipping process may still be alive (e.g. the host
+            # outlives SnippingTool.exe); keep waiting until they have all
+            # exited or the clipboard changes.
+            if snippingtool_running():
+                continue
+
+            seq = last_checked_seq
+            if seq and user32.GetClipboardSequenceNumber() == seq:
+                logging.info("[SnippingTool] Detected close. Clipboard unchanged.")
+                # A cancelled tray snip must not leave its token for the next one.
+                if get_settings().get("tray_snip_token"):
+                    update_settings({}, delete_keys=["tray_snip_token"])
+                continue
+            logging.info("[SnippingTool] Detected close. Checking clipboard...")
+        else:
+            logging.info("[SnippingTool] Clipboard changed. Checking clipboard...")
+        # Read before grabbing, so a copy landing mid-grab is seen next time.
+        last_checked_seq = user32.GetClipboardSequenceNumber()
+        hash_val, image_data = grab_clipboard_image_and_hash(last_hash)
+        if reason == SNIP_COPIED and not hash_val:
+            # Something other than an image was copied mid-session; keep the
+            # tray token for the snip still in progress.
+            continue
+
+        settings = get_settings()
+        tray_snip_token = settings.get("tray_snip_token")
+        is_tray_snip = bool(tray_snip_token)
+
+        if is_tray_snip:
+            logging.info(f"Consumed snip token: {tray_snip_token}")
+            # Atomically consume the token by deleting it from settings
+            update_settings({}, delete_keys=["tray_snip_token"])
+
+        if hash_val and hash_val != last_hash:
+            logging.info("[SnippingTool] New clipboard image found.")
+            last_hash = hash_val
+            update_settings({"last_detected_image": hash_val})
+            tray_status = get_tray_status()
+
+            do_upload = tray_status == 2 or (tray_status == 1 and is_tray_snip)
+            do_open_lens = do_upload
+
+            cached_url = cached_upload_url(hash_val) if do_upload else None
+            if cached_url:
+                logging.info(f"[Litterbox] Reusing earlier upload: {cached_url}")
+                update_settings({"last_litterbox_url": cached_url})
+                open_google_lens(cached_url)
+            elif do_upload and image_data is not None:
+                # Imported lazily: only needed once a snip is actually uploaded.
+                from io import BytesIO
+                from PIL import BmpImagePlugin, Image
+
+                try:
+                    img = BmpImagePlugin.DibImageFile(BytesIO(image_data))
+                    img.load()
+                except Exception as e:
+                    logging.error(f"[SnippingTool] Could not decode clipboard bitmap: {e}")
+                    continue
+                if max(img.size) > MAX_LENS_UPLOAD_DIM:
+                    img.thumbnail(
+                        (MAX_LENS_UPLOAD_DIM, MAX_LENS_UPLOAD_DIM),
+                        Image.Resampling.LANCZOS,
                     )
-                    with BytesIO() as output:
-                        img.save(output, format="PNG")
-                        output.seek(0)
-                        files = {
-                            "reqtype": (None, "fileupload"),
-                            "time": (None, "1h"),
-                            "fileToUpload": ("snip.png", output, "image/png"),
-                        }
-                        logging.info("[Litterbox] Uploading image...")
-                        try:
-                            response = requests.post(
-                                "https://litterbox.catbox.moe/resources/internals/api.php",
-                                files=files,
-                                timeout=10,
-                            )
-                            if response.status_code == 200:
-                                url = response.text.strip()
-                                logging.info(f"[Litterbox] Upload success: {url}")
-                                update_settings({"last_litterbox_url": url})
-                                if do_open_lens:
-                                    lens_url = (
-                                        f"https://lens.google.com/uploadbyurl?url={url}"
-                                    )
-                                    logging.info(f"[Google Lens] Opening: {lens_url}")
-                                    webbrowser.open_new_tab(lens_url)
-                            else:
-                                logging.error(
-                                    f"[Litterbox] Upload failed with status: {response.status_code}"
-                                )
-                        except Exception as e:
-                            logging.error(f"[Litterbox] Upload error: {e}")
+                if img.mode == "RGB":
+                    # Lens reads JPEG fine, and libjpeg-turbo encodes several
+                    # times faster than zlib into a smaller upload.
+                    name, mime = "snip.jpg", "image/jpeg"
+                    save_args = {"format": "JPEG", "quality": 90}
                 else:
-                    logging.info(
-                        "[SnippingTool] No upload or duplicate or not allowed."
-                    )
+                    # Keep alpha/palette images lossless; zlib level 1 is
+                    # several times faster than the default 6.
+                    name, mime = "snip.png", "image/png"
+                    save_args = {"format": "PNG", "compress_level": 1}
+                with BytesIO() as output:
+                    img.save(output, **save_args)
+                    output.seek(0)
+                    files = {
+                        "reqtype": (None, "fileupload"),
+                        "time": (None, "1h"),
+                        "fileToUpload": (name, output, mime),
+                    }
+                    logging.info("[Litterbox] Uploading image...")
+                    try:
+                        response = get_http_session().post(
+                            "https://litterbox.catbox.moe/resources/internals/api.php",
+                            files=files,
+                            timeout=10,
+                        )
+                        if response.status_code == 200:
+                            url = response.text.strip()
+                            logging.info(f"[Litterbox] Upload success: {url}")
+                            update_settings({"last_litterbox_url": url})
+                            remember_upload_url(hash_val, url)
+                            if do_open_lens:
+                                open_google_lens(url)
+                        else:
+                            logging.error(
+                                f"[Litterbox] Upload failed with status: {response.status_code}"
+                            )
+                    except Exception as e:
+                        logging.error(f"[Litterbox] Upload error: {e}")
             else:
-                logging.info("[SnippingTool] No new image or duplicate.")
-
-        last_snip_running = now_running
-        time.sleep(0.2)
+                logging.info(
+                    "[SnippingTool] No upload or duplicate or not allowed."
+                )
+        else:
+            logging.info("[SnippingTool] No new image or duplicate.")
 
 
 def watchdog_tray_monitor():
+    lower_thread_priority()
     missing_counter = 0
     check_interval = 1
     max_missing = 5
 
-    while True:
-        if os.path.exists(EXIT_WATCHDOG):
-            break
-
+    while not shutdown_event.is_set():
         if not is_tray_running():
             missing_counter += 1
             if missing_counter >= max_missing:
                 logging.info("[Watchdog] Tray app missing. Signaling watchdog exit.")
                 with open(EXIT_WATCHDOG, "w") as f:
                     f.write("exit from tray monitor")
+                shutdown_event.set()
                 break
         else:
             missing_counter = 0
-        time.sleep(check_interval)
+        if shutdown_event.wait(check_interval):
+            break
 
 
 def hotkey_monitor_loop():
     """Monitor for hotkey setting changes and update the listener"""
-    last_check_time = 0
+    lower_thread_priority()
     check_interval = 2  # Check every 2 seconds
 
-    while True:
-        if os.path.exists(EXIT_WATCHDOG):
-            break
-
-        current_time = time.time()
-        if current_time - last_check_time >= check_interval:
-            try:
-                setup_hotkey_listener()
-            except Exception as e:
-                logging.error(f"[Hotkey] Error in hotkey monitor: {e}")
-            last_check_time = current_time
+    # shutdown_event.wait measures the interval on a monotonic clock, so there
+    # is no need to wake early and compare wall-clock timestamps.
+    while not shutdown_event.is_set():
+        try:
+            setup_hotkey_listener()
+        except Exception as e:
+            logging.error(f"[Hotkey] Error in hotkey monitor: {e}")
 
-        time.sleep(0.5)
+        if shutdown_event.wait(check_interval):
+            break
 
 
 class SettingsHandler(FileSystemEventHandler):
@@ -448,7 +825,14 @@ class SettingsHandler(FileSystemEventHandler):
         setup_hotkey_listener()
 
     def on_modified(self, event):
-        if os.path.abspath(event.src_path) == os.path.abspath(SETTINGS_PATH):
+        self.settings_changed(event.src_path)
+
+    def on_moved(self, event):
+        # The config window saves by replacing the file.
+        self.settings_changed(event.dest_path)
+
+    def settings_changed(self, path):
+        if os.path.abspath(path) == SETTINGS_PATH:
             current_state = tray_setting()
             if current_state != self.last_state:
                 if current_state:
@@ -462,6 +846,20 @@ class SettingsHandler(FileSystemEventHandler):
             setup_hotkey_listener()
 
 
+# Fallback poll for the exit file in case its filesystem event is missed.
+EXIT_CHECK_INTERVAL = 2
+
+
+class ExitTriggerHandler(FileSystemEventHandler):
+    """Wake the main loop as soon as .exit_watchdog appears."""
+
+    def on_created(self, event):
+        if os.path.abspath(event.src_path) == EXIT_WATCHDOG:
+            shutdown_event.set()
+
+    on_modified = on_created
+
+
 def cleanup_hotkey_listener():
     """Clean up the hotkey listener on exit"""
     global hotkey_listener
@@ -479,9 +877,6 @@ if __name__ == "__main__":
     except OSError:
         pass
 
-    # Register cleanup for hotkey listener
-    atexit.register(cleanup_hotkey_listener)
-
     if not is_tray_running():
         launch_tray()
 
@@ -499,10 +894,14 @@ if __name__ == "__main__":
     observer = Observer()
     event_handler = SettingsHandler()
     observer.schedule(event_handler, EXE_DIR, recursive=False)
+    observer.schedule(ExitTriggerHandler(), EXE_DIR, recursive=False)
     observer.start()
     try:
-        while not os.path.exists(EXIT_WATCHDOG):
-            time.sleep(0.2)
+        # ExitTriggerHandler sets shutdown_event when the exit file appears;
+        # the slow check only backs it up should the event be missed.
+        while not shutdown_event.wait(EXIT_CHECK_INTERVAL):
+            if os.path.exists(EXIT_WATCHDOG):
+                break
 
         logging.info("[Watchdog] Exit signal received. Shutting down.")
 
@@ -517,6 +916,7 @@ if __name__ == "__main__":
             f.write("exit from keyboard interrupt")
 
     finally:
+        shutdown_event.set()
         cleanup_hotkey_listener()
         observer.stop()
         observer.join()